@@ -1,4 +1,8 @@
 from a2_support import *
+from collections.abc import Mapping
+from distances import UNREACHABLE, distance_field, passable_table
+from level_cache import LEVEL_CACHE
+from level_format import PositionIndex, load_compiled
 
 class GameLogic:
     """
@@ -13,16 +17,69 @@ class GameLogic:
             dungeon_name (str): The name of the level.
         """
 
-        self._dungeon = load_game(dungeon_name)
-        self._dungeon_size = len(self._dungeon)
+        self._start(load_level(dungeon_name), level_moves(dungeon_name))
+
+    @classmethod
+    def from_level(cls, level, move_count):
+        """
+        Constructs a GameLogic on an already parsed level with a given move budget, e.g. for levels that are not
+        listed in a manifest yet.
+
+        Parameters:
+            level(Level): The parsed level to play.
+            move_count(int): The number of moves the Player starts with.
+
+        Returns:
+            GameLogic: A new game on the level.
+        """
+        game = cls.__new__(cls)
+        game._start(level, move_count)
+        return game
+
+    @classmethod
+    def from_compiled(cls, filename):
+        """
+        Constructs a GameLogic from a compiled level file (see level_format) without parsing any text. The grid,
+        position index and move budget are all read directly from the file.
+
+        Parameters:
+            filename (str): The compiled level file.
+
+        Returns:
+            GameLogic: A new game on the compiled level.
+        """
+        level = LEVEL_CACHE.get(filename, Level.from_compiled)
+        game = cls.__new__(cls)
+        game._start(level, level.get_moves())
+        return game
+
+    def _start(self, level, move_count):
+        """
+        Sets up a new game on the given level. The level is shared, never modified; items collected during this game
+        are recorded in a per-game overlay instead.
+
+        Parameters:
+            level(Level): The parsed level to play.
+            move_count(int): The number of moves the Player starts with.
+        """
+        self._level = level
+        self._dungeon = level.get_grid()
+        self._dungeon_size = self._dungeon.get_width()
+        self._collected = set()
+        self._distance_fields = {}
 
         # you need to implement the Player class first.
-        self._player = Player(GAME_LEVELS[dungeon_name])
+        self._player = Player(move_count)
 
-        # you need to implement the init_game_information() method for this.
-        self._game_information = self.init_game_information()
+        # The position index is built on demand, so only the Player's position is looked up here; see
+        # init_game_information for the full index.
+        self._game_information = None
+        self._player.set_position(self.get_positions(PLAYER)[0])
 
         self._win = False
+        self._quit = False
+        self._confirming_quit = False
+        self._events = None
 
     def get_positions(self, entity):
         """ Returns a list of tuples containing all positions of a given Entity
@@ -36,13 +93,10 @@ class GameLogic:
             positions of a given entity id.
         """
 
-        positions = []
-        for row, line in enumerate(self._dungeon):
-            for col, char in enumerate(line):
-                if char == entity:
-                    positions.append((row, col))
-
-        return positions
+        positions = self._level.get_sorted_positions(entity)
+        if not self._collected:
+            return list(positions)
+        return [position for position in positions if position not in self._collected]
 
     def get_dungeon_size(self) -> int:
         '''
@@ -51,6 +105,35 @@ class GameLogic:
         '''
         return self._dungeon_size
 
+    def get_dungeon_dimensions(self) -> tuple:
+        """
+        Returns the dimensions of the dungeon. Unlike get_dungeon_size this also describes dungeons that are not
+        square.
+
+        Returns:
+            tuple<int, int>: Return the (height, width) of the dungeon.
+        """
+        return self._dungeon.get_height(), self._dungeon.get_width()
+
+    def get_static_rows(self):
+        """
+        Returns the rows of the dungeon as drawn with no Player and nothing collected, shared by every game on the
+        level (see Level.get_static_rows).
+
+        Returns:
+            tuple<str> or GridRows: Return one string per row.
+        """
+        return self._level.get_static_rows()
+
+    def get_collected(self):
+        """
+        Returns the positions of the items collected so far in this game. The set is live and must not be modified.
+
+        Returns:
+            set<tuple<int, int>>: Return the positions of items removed from the dungeon.
+        """
+        return self._collected
+
     def init_game_information(self) -> dict:
         """
         This method should return a dictionary containing the position and the corresponding Entity as the
@@ -60,62 +143,115 @@ class GameLogic:
         Returns:
             d(dict<tuple<int, int>): Return a dictionary containing the position and the corresponding Entity.
         """
-        d = {}
-        wall = Wall()
-        door = Door()
-        move_increase = MoveIncrease()
-        key = Key()
+        self._player.set_position(self.get_positions(PLAYER)[0])
+        return self.get_game_information()
 
-        list_player = self.get_positions(PLAYER)
-        self._player.set_position(list_player[0])
-
-        list_key = self.get_positions(KEY)
-        if list_key:
-            d[list_key[0]] = key
-
-        list_door = self.get_positions(DOOR)
-        d[list_door[0]] = door
-
-        list_wall = self.get_positions(WALL)
-        for i in list_wall:
-            d[i] = wall
-
-        list_move_increase = self.get_positions(MOVE_INCREASE)
-        for i in list_move_increase:
-            d[i] = move_increase
+    def get_entities(self):
+        """
+        Returns the position to Entity index of the current dungeon without copying it: the level's Entities seen
+        through this game's collected cells. Drawing code should use this rather than get_game_information, which has
+        to build a dictionary of its own once anything is collected.
 
-        return d
+        Returns:
+            Mapping<tuple<int, int>, Entity>: Return a live, read-only view of the Entity at each occupied position.
+        """
+        return EntityView(self._level, self._collected)
 
     def get_game_information(self) -> dict:
         """
         Returns a dictionary containing the position and the corresponding Entity, as the keys and values, for the
         current dungeon.
 
+        Until an item is collected this is the index shared by every game on the level. After that the game keeps
+        its own copy, made on the first call and then updated in place by remove_entity. Either way it is a live view
+        and must be treated as read-only by callers. The copy costs as much as the level's index, so code that only
+        looks entities up should use get_entities instead.
+
         Returns:
             d(dict<tuple<int, int>): Return a dictionary containing the position and the corresponding Entity.
         """
-        d = {}
-        wall = Wall()
-        door = Door()
-        move_increase = MoveIncrease()
-        key = Key()
+        if not self._collected:
+            return self._level.get_entities()
+        if self._game_information is None:
+            d = dict(self._level.get_entities())
+            for position in self._collected:
+                del d[position]
+            self._game_information = d
+        return self._game_information
+
+    def remove_entity(self, position) -> None:
+        """
+        Removes the Entity at the given position from the dungeon, e.g. when an Item has been collected. The shared
+        level is left untouched: the position is added to this game's overlay of collected cells.
+
+        Parameters:
+            position(tuple<int, int>): Position of the Entity to be removed.
+        """
+        if self.get_entity(position) is not None:
+            self._collected.add(position)
+            self._distance_fields.clear()
+            if self._game_information is not None:
+                del self._game_information[position]
+
+    def get_distance_field(self, entity):
+        """
+        Returns the number of moves needed to walk from every cell to the nearest remaining Entity of a given id.
+        Fields are computed for the whole dungeon at once and cached: on the shared level while none of that Entity
+        has been collected, otherwise on this game until the dungeon next changes.
+
+        Parameters:
+            entity(str): The id of the Entity to walk to.
 
-        list_key = self.get_positions(KEY)
-        if list_key:
-            d[list_key[0]] = key
+        Returns:
+            array<int>: Return the distance for each cell, indexed by row * width + col, with UNREACHABLE (-1) where
+            no such Entity can be reached.
+        """
+        field = self._distance_fields.get(entity)
+        if field is None:
+            targets = self._level.get_positions(entity)
+            if self._collected.isdisjoint(targets):
+                field = self._level.get_distance_field(entity)
+            else:
+                width = self._dungeon_size
+                seeds = {row * width + col: 0 for row, col in targets if (row, col) not in self._collected}
+                field = distance_field(self._dungeon.to_bytes(), self._level.get_passable(), width,
+                                       self._dungeon.get_height(), seeds)
+            self._distance_fields[entity] = field
+        return field
+
+    def get_hint(self):
+        """
+        Suggests the direction to move in next: towards the key while the Player has none, then towards the door.
 
-        list_door = self.get_positions(DOOR)
-        d[list_door[0]] = door
+        Returns:
+            str or None: Return the direction that gets closest, or None if the target cannot be reached.
+        """
+        field = self.get_distance_field(DOOR if self._player.get_inventory() else KEY)
+        best = None
+        best_distance = UNREACHABLE
+        for direction in DIRECTIONS:
+            position = self.new_position(direction)
+            if not self._dungeon.in_bounds(position):
+                continue
+            distance = field[position[0] * self._dungeon_size + position[1]]
+            if distance != UNREACHABLE and (best is None or distance < best_distance):
+                best, best_distance = direction, distance
+        return best
 
-        list_wall = self.get_positions(WALL)
-        for i in list_wall:
-            d[i] = wall
+    def get_tile(self, position):
+        """
+        Returns the id of the tile at a given position as it currently stands in this game, taking collected items
+        into account. The Player's starting tile is reported as it appears in the level file.
 
-        list_move_increase = self.get_positions(MOVE_INCREASE)
-        for i in list_move_increase:
-            d[i] = move_increase
+        Parameters:
+            position(tuple<int, int>): Position of the tile.
 
-        return d
+        Returns:
+            str or None: Return the tile id, or None if the position is off map.
+        """
+        if position in self._collected:
+            return SPACE
+        return self._dungeon.get_tile(position)
 
     def get_player(self):
         """
@@ -138,11 +274,9 @@ class GameLogic:
             Entity or None: Return the Entity in the given direction.
 
         """
-        d = self.get_game_information()
-        if position in d:
-            return d[position]
-        else:
+        if position in self._collected:
             return None
+        return self._level.get_entity(position)
 
     def get_entity_in_direction(self, direction):
         """
@@ -231,6 +365,450 @@ class GameLogic:
         """
         return self._win
 
+    def has_quit(self) -> bool:
+        """
+        Return True if the player has quit the game through step().
+
+        Returns:
+            bool: Return True if the player has quit.
+        """
+        return self._quit
+
+    def is_confirming_quit(self) -> bool:
+        """
+        Return True if step() is waiting for the answer to "Are you sure you want to quit?".
+
+        Returns:
+            bool: Return True if the next action is read as the answer to the quit prompt.
+        """
+        return self._confirming_quit
+
+    def is_over(self) -> bool:
+        """
+        Return True once the game has been won, lost or quit.
+
+        Returns:
+            bool: Return True if no further actions can be played.
+        """
+        return self._win or self._quit or self.check_game_over()
+
+    def report(self, event, data=None) -> None:
+        """
+        Reports something that happened in the game. During step() the event is added to its StepResult; otherwise
+        the event's message, if it has one, is printed.
+
+        Parameters:
+            event(str): One of the EVENT_* kinds.
+            data: The data that goes with the event kind.
+        """
+        if self._events is not None:
+            self._events.append((event, data))
+        else:
+            text = describe_event((event, data))
+            if text is not None:
+                print(text)
+
+    def step(self, action):
+        """
+        Plays one line of input with exactly the rules of GameApp.play, without reading input or printing. Whatever
+        play would have printed is returned as events instead. Answering the quit prompt is a step too: after QUIT
+        the next action is read as the answer. Once the game is over a step does nothing.
+
+        Parameters:
+            action(str): The line the player typed.
+
+        Returns:
+            StepResult: Return what happened and the state of the game afterwards.
+        """
+        if self.is_over():
+            return StepResult(action, (), self)
+
+        self._events = events = []
+        try:
+            if self._confirming_quit:
+                self._confirming_quit = False
+                self._quit = action == CONFIRM_QUIT
+            elif action == HELP:
+                events.append((EVENT_HELP, None))
+            elif action == HINT:
+                events.append((EVENT_HINT, self.get_hint()))
+            elif action == QUIT:
+                self._confirming_quit = True
+                events.append((EVENT_CONFIRM_QUIT, None))
+            elif action in DIRECTIONS:
+                entity = self.get_entity_in_direction(action)
+                if not self.collision_check(action):
+                    self.move_player(action)
+                    events.append((EVENT_MOVED, self._player.get_position()))
+                else:
+                    events.append((EVENT_BLOCKED, action))
+                self._player.change_move_count(-1)
+                if entity and entity.can_collide():
+                    entity.on_hit(self)
+            else:
+                actions = action.split()
+                if len(actions) > 1 and actions[0] == INVESTIGATE and actions[1] in DIRECTIONS:
+                    entity = self.get_entity_in_direction(actions[1])
+                    events.append((EVENT_INVESTIGATED, (actions[1], entity)))
+                    self._player.change_move_count(-1)
+                else:
+                    events.append((EVENT_INVALID, action))
+        finally:
+            self._events = None
+
+        return StepResult(action, tuple(events), self)
+
+    def snapshot(self):
+        """
+        Captures the mutable state of the game. The level itself is shared rather than copied, so this costs the
+        number of changes made during the game (items collected and held), not the size of the dungeon.
+
+        Returns:
+            GameSnapshot: Return the captured state, which restore() or from_snapshot() can return to.
+        """
+        player = self._player
+        return GameSnapshot(self._level, player.get_position(), player.moves_remaining(),
+                            tuple(player.get_inventory()), frozenset(self._collected), self._win)
+
+    def restore(self, snapshot) -> None:
+        """
+        Returns this game to a state captured by snapshot(). The snapshot must have been taken on the same level.
+
+        Parameters:
+            snapshot(GameSnapshot): The state to return to.
+        """
+        if snapshot.get_level() is not self._level:
+            raise ValueError("snapshot was taken on a different level")
+        self._player.set_position(snapshot.get_position())
+        self._player.move_count = snapshot.get_moves()
+        self._player.inventory = list(snapshot.get_inventory())
+        self._collected = set(snapshot.get_collected())
+        self._game_information = None
+        self._distance_fields = {}
+        self._win = snapshot.won()
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Constructs a new game in a state captured by snapshot().
+
+        Parameters:
+            snapshot(GameSnapshot): The state to start from.
+
+        Returns:
+            GameLogic: A new game sharing the snapshot's level.
+        """
+        game = cls.__new__(cls)
+        game._level = snapshot.get_level()
+        game._dungeon = game._level.get_grid()
+        game._dungeon_size = game._dungeon.get_width()
+        game._player = Player(snapshot.get_moves())
+        game._game_information = None
+        game._distance_fields = {}
+        game._quit = False
+        game._confirming_quit = False
+        game._events = None
+        game.restore(snapshot)
+        return game
+
+    def fork(self):
+        """
+        Returns an independent copy of this game. The copy shares the level and copies only the mutable state, so
+        moves made in one game do not affect the other.
+
+        Returns:
+            GameLogic: Return the copy.
+        """
+        return GameLogic.from_snapshot(self.snapshot())
+
+
+class StepResult:
+    """
+    The outcome of GameLogic.step: the events the action caused and the state of the game afterwards.
+    """
+
+    __slots__ = ('_action', '_events', '_position', '_moves', '_won', '_lost', '_quit')
+
+    def __init__(self, action, events, game):
+        """
+        Constructor of the StepResult class.
+
+        Parameters:
+            action(str): The action that was played.
+            events(tuple<tuple<str, object>>): The (event, data) pairs the action caused, in order.
+            game(GameLogic): The game, read after the action was played.
+        """
+        player = game.get_player()
+        self._action = action
+        self._events = events
+        self._position = player.get_position()
+        self._moves = player.moves_remaining()
+        self._won = game.won()
+        self._quit = game.has_quit()
+        self._lost = not self._won and game.check_game_over()
+
+    def get_action(self):
+        """
+        Returns:
+            str: Return the action that was played.
+        """
+        return self._action
+
+    def get_events(self):
+        """
+        Returns:
+            tuple<tuple<str, object>>: Return the (event, data) pairs the action caused, in order.
+        """
+        return self._events
+
+    def get_position(self):
+        """
+        Returns:
+            tuple<int, int>: Return the Player's position after the action.
+        """
+        return self._position
+
+    def get_moves(self):
+        """
+        Returns:
+            int: Return the number of moves left after the action.
+        """
+        return self._moves
+
+    def won(self):
+        """
+        Returns:
+            bool: Return True if the game has been won.
+        """
+        return self._won
+
+    def lost(self):
+        """
+        Returns:
+            bool: Return True if the game has been lost.
+        """
+        return self._lost
+
+    def has_quit(self):
+        """
+        Returns:
+            bool: Return True if the player has quit.
+        """
+        return self._quit
+
+    def is_over(self):
+        """
+        Returns:
+            bool: Return True if the game ended with this action or before it.
+        """
+        return self._won or self._lost or self._quit
+
+
+def describe_event(event):
+    """
+    Returns the message GameApp.play prints for an event reported by GameLogic.step, or None for events that are
+    not printed.
+
+    Parameters:
+        event(tuple<str, object>): The (event, data) pair.
+
+    Returns:
+        str or None: Return the message for the event.
+    """
+    kind, data = event
+    if kind == EVENT_BLOCKED or kind == EVENT_INVALID:
+        return INVALID
+    if kind == EVENT_HELP:
+        return HELP_MESSAGE
+    if kind == EVENT_NO_KEY:
+        return NO_KEY_TEXT
+    if kind == EVENT_HINT:
+        return NO_HINT_TEXT if data is None else HINT_TEXT.format(data)
+    if kind == EVENT_INVESTIGATED:
+        direction, entity = data
+        return str(entity) + " is on the " + direction + " side."
+    return None
+
+
+def render_frame(game):
+    """
+    Returns the text GameApp.draw shows for a game: the dungeon with all Entities in their positions, then the moves
+    left.
+
+    Parameters:
+        game(GameLogic): The game to draw.
+
+    Returns:
+        str: Return the frame, ending in a blank line.
+    """
+    display = Display(game.get_entities(), game.get_dungeon_dimensions(), game.get_static_rows(),
+                      game.get_collected())
+    player = game.get_player()
+    return display.render_game(player.get_position()) + "\n" + display.render_moves(player.moves_remaining()) + "\n"
+
+
+class EntityView(Mapping):
+    """
+    A read-only view of the Entities on a level with some positions masked out, such as the items one game has
+    collected. Nothing is copied: lookups go to the shared level, so a view costs O(1) memory however large the
+    level is.
+    """
+
+    __slots__ = ('_level', '_masked')
+
+    def __init__(self, level, masked):
+        """
+        Constructor of the EntityView class.
+
+        Parameters:
+            level(Level): The level to view.
+            masked(set<tuple<int, int>>): The positions to hide. The view follows later changes to the set.
+        """
+        self._level = level
+        self._masked = masked
+
+    def __getitem__(self, position):
+        """
+        Returns the Entity at a position, raising KeyError if there is none or it is masked.
+        """
+        entity = self.get(position)
+        if entity is None:
+            raise KeyError(position)
+        return entity
+
+    def get(self, position, default=None):
+        """
+        Returns the Entity at a position, or default if there is none or it is masked.
+        """
+        if position in self._masked:
+            return default
+        entity = self._level.get_entity(position)
+        return default if entity is None else entity
+
+    def __contains__(self, position):
+        """
+        Returns True if an Entity is visible at a position.
+        """
+        return self.get(position) is not None
+
+    def __iter__(self):
+        """
+        Iterates over the positions holding a visible Entity. This builds the level's position to Entity index if
+        it has not been built yet.
+        """
+        masked = self._masked
+        return (position for position in self._level.get_entities() if position not in masked)
+
+    def __len__(self):
+        """
+        Returns the number of positions holding a visible Entity.
+        """
+        return len(self._level.get_entities()) - len(self._masked)
+
+
+def play_turns(app):
+    """
+    The turn loop of GameApp.play, shared by front ends that read input in other ways (see async_app). It is a
+    generator: it yields each prompt the player must answer and is sent back the line they entered, which lets the
+    caller read that line however it likes, e.g. by awaiting it. It returns once the game is won, lost or quit.
+
+    Parameters:
+        app: The front end. It must provide get_game(), step(action), draw() and show_message(text) as GameApp does.
+
+    Yields:
+        str: Return the prompt to show before reading the next line.
+    """
+    while not app.get_game().won() and not app.get_game().check_game_over():
+        app.draw()
+        for action in expand_command((yield ACTION_PROMPT)):
+            result = app.step(action)
+            while True:
+                for event in result.get_events():
+                    text = describe_event(event)
+                    if text is not None:
+                        app.show_message(text)
+                if result.has_quit():
+                    return
+                if not app.get_game().is_confirming_quit():
+                    break
+                result = app.step((yield QUIT_PROMPT))
+            if result.is_over():
+                break
+    if app.get_game().won():
+        app.show_message(WIN_TEXT)
+    elif app.get_game().check_game_over():
+        app.show_message(LOSE_TEST)
+
+
+class GameSnapshot:
+    """
+    The mutable state of a GameLogic at one point in time: everything that can differ between two games on the same
+    level. A GameSnapshot is immutable.
+    """
+
+    __slots__ = ('_level', '_position', '_moves', '_inventory', '_collected', '_win')
+
+    def __init__(self, level, position, moves, inventory, collected, win):
+        """
+        Constructor of the GameSnapshot class.
+
+        Parameters:
+            level(Level): The level the game is played on.
+            position(tuple<int, int>): The position of the Player.
+            moves(int): The number of moves the Player has left.
+            inventory(tuple<Entity>): The items the Player holds.
+            collected(frozenset<tuple<int, int>>): The positions of items removed from the level.
+            win(bool): The game's win state.
+        """
+        self._level = level
+        self._position = position
+        self._moves = moves
+        self._inventory = inventory
+        self._collected = collected
+        self._win = win
+
+    def get_level(self):
+        """
+        Returns:
+            Level: Return the level the game is played on.
+        """
+        return self._level
+
+    def get_position(self):
+        """
+        Returns:
+            tuple<int, int>: Return the position of the Player.
+        """
+        return self._position
+
+    def get_moves(self):
+        """
+        Returns:
+            int: Return the number of moves the Player has left.
+        """
+        return self._moves
+
+    def get_inventory(self):
+        """
+        Returns:
+            tuple<Entity>: Return the items the Player holds.
+        """
+        return self._inventory
+
+    def get_collected(self):
+        """
+        Returns:
+            frozenset<tuple<int, int>>: Return the positions of items removed from the level.
+        """
+        return self._collected
+
+    def won(self):
+        """
+        Returns:
+            bool: Return the game's win state.
+        """
+        return self._win
+
 
 class GameApp:
     """
@@ -242,41 +820,75 @@ class GameApp:
         Constructor of the GameApp class.
         """
         self._game = GameLogic()
+        self._writer = FrameWriter()
+
+    def set_output(self, stream) -> None:
+        """
+        Sends everything the app shows to a stream instead of standard output, e.g. NULL_SINK for headless runs.
+
+        Parameters:
+            stream(io.TextIOBase): Where output goes.
+        """
+        self._writer = FrameWriter(stream)
 
     def play(self) -> None:
         """
-        Handles the player interaction.
+        Handles the player interaction. Everything shown in a turn, up to and including the next prompt, is written
+        at once. A line may hold a batch of moves such as "DDWSS" or "5D" (see expand_command); they are played one
+        by one exactly as if entered on separate lines, and the dungeon is drawn again only once the batch ends or
+        the game does.
         """
-        while not self._game.won() and not self._game.check_game_over():
-            self.draw()
-            action = input("Please input an action: ")
-            if action == HELP:
-                print(HELP_MESSAGE)
-            elif action == QUIT:
-                q = input("Are you sure you want to quit? (y/n): ")
-                if q == 'y':
-                    return
-            elif action in DIRECTIONS:
-                entity = self._game.get_entity_in_direction(action)
-                if not self._game.collision_check(action):
-                    self._game.move_player(action)
-                else:
-                    print(INVALID)
-                self._game.get_player().change_move_count(-1)
-                if entity and entity.can_collide():
-                    entity.on_hit(self._game)
-            else:
-                actions = action.split()
-                if actions and actions[0] == INVESTIGATE and actions[1] in DIRECTIONS:
-                    entity = self._game.get_entity_in_direction(actions[1])
-                    print(str(entity) + " is on the " + actions[1] + " side.")
-                    self._game.get_player().change_move_count(-1)
-                else:
-                    print(INVALID)
-        if self._game.won():
-            print(WIN_TEXT)
-        elif self._game.check_game_over():
-            print(LOSE_TEST)
+        with self._writer.batch():
+            turns = play_turns(self)
+            try:
+                prompt = next(turns)
+                while True:
+                    prompt = turns.send(self.read_action(prompt))
+            except StopIteration:
+                pass
+
+    def get_game(self):
+        """
+        Returns:
+            GameLogic: Return the game being played.
+        """
+        return self._game
+
+    def step(self, action):
+        """
+        Plays one action on the game.
+
+        Parameters:
+            action(str): The action.
+
+        Returns:
+            StepResult: Return what happened.
+        """
+        return self._game.step(action)
+
+    def read_action(self, prompt) -> str:
+        """
+        Shows the output held for this turn followed by a prompt, then asks the player for their next input. Front
+        ends that read input differently override this.
+
+        Parameters:
+            prompt(str): The prompt to show.
+
+        Returns:
+            str: The line the player entered.
+        """
+        self._writer.write(prompt)
+        self._writer.flush()
+        return input()
+
+    def show_message(self, text) -> None:
+        """
+        Shows a message to the player. Front ends that lay out the screen themselves override this.
+
+        Parameters:
+            text(str): The message to show.
+        """
+        self._writer.write(text + "\n")
 
     def entity_in_direction(self, direction):
         """
@@ -294,15 +906,7 @@ class GameApp:
         """
         Displays the dungeon with all Entities in their positions.
         """
-        game_information = self._game.get_game_information()
-        dungeon_size = self._game._dungeon_size
-        display = Display(game_information, dungeon_size)
-
-        player_pos = self._game.get_player().get_position()
-        display.display_game(player_pos)
-
-        moves = self._game.get_player().moves_remaining()
-        display.display_moves(moves)
+        self._writer.write(render_frame(self._game))
     # pass
 
 
@@ -313,6 +917,8 @@ class Entity:
     True for an Entity upon creation. Entity should be constructed with Entity().
     """
 
+    __slots__ = ('id', 'collidable')
+
     def __init__(self):
         """
         Constructor of the Entity class.
@@ -371,6 +977,8 @@ class Wall(Entity):
     The Wall Entity cannot be collided with. Wall should be constructed with Wall().
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """
         Constructor of the Wall class.
@@ -401,6 +1009,8 @@ class Item(Entity):
     By default the Item Entity can be collided with. Item should be constructed with Item().
     """
 
+    __slots__ = ()
+
     def __str__(self) -> str:
         """
         Returns the string representation of the Wall. e.g. "Item('Entity')"
@@ -433,6 +1043,8 @@ class Key(Item):
     The Key Item can be collided with. Key should be constructed with Key().
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """
         Constructor of the Key class.
@@ -466,8 +1078,8 @@ class Key(Item):
         """
         player = game.get_player()
         player.add_item(self)
-        i, j = game.get_positions(KEY)[0]
-        game._dungeon[i][j] = SPACE
+        game.remove_entity(player.get_position())
+        game.report(EVENT_COLLECTED, self)
 
 
 class MoveIncrease(Item):
@@ -477,6 +1089,8 @@ class MoveIncrease(Item):
     granted when they collect this Item, the default value should be 5.
     """
 
+    __slots__ = ('moves',)
+
     def __init__(self, moves=5):
         """
         Constructor of the MoveIncrease class.
@@ -513,9 +1127,10 @@ class MoveIncrease(Item):
         Parameters:
             game(GameLogic): The game.
         """
-        game.get_player().change_move_count(self.moves)
-        i, j = game.get_positions(MOVE_INCREASE)[0]
-        game._dungeon[i][j] = SPACE
+        player = game.get_player()
+        player.change_move_count(self.moves)
+        game.remove_entity(player.get_position())
+        game.report(EVENT_COLLECTED, self)
 
 
 class Door(Entity):
@@ -524,6 +1139,8 @@ class Door(Entity):
     able to share its position with the Door when the Player enters the Door.) Door should be constructed with Door().
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """
         Constructor of the Door class.
@@ -554,16 +1171,18 @@ class Door(Entity):
         if inventory:
             game.set_win(True)
         else:
-            print("You don't have the key!")
+            game.report(EVENT_NO_KEY)
 
 
 class Player(Entity):
     """
     A Player is a special type of an Entity within the game. The Player Entity can be collided with. The Player
     should be constructed with Player(move_count: int) where moves represents how many moves a Player can have for
-    the given dungeon they are in (see GAME_LEVELS).
+    the given dungeon they are in (see level_moves).
     """
 
+    __slots__ = ('move_count', 'position', 'inventory')
+
     def __init__(self, move_count):
         """
         Constructor of the Player class.
@@ -650,6 +1269,270 @@ class Player(Entity):
         return self.__str__()
 
 
+class Level:
+    """
+    A parsed level: its tile grid plus indexes of where every Entity is. A Level is immutable once built, so a single
+    instance is shared (through LEVEL_CACHE) by every GameLogic playing it.
+
+    Entities are looked up through the tile on the grid. Walls and doors show one shared Entity per tile id (see
+    TILE_ENTITIES), while each cell holding an Item gets its own, made the first time the cell is looked up (see
+    TILE_ITEMS), so starting a game allocates nothing per cell. The position sets and the position to Entity index
+    are built the first time they are asked for.
+    """
+
+    __slots__ = ('_grid', '_positions', '_sorted_positions', '_entities', '_items', '_moves', '_passable',
+                 '_distance_fields', '_static_rows')
+
+    def __init__(self, grid, positions=None, moves=None):
+        """
+        Constructor of the Level class.
+
+        Parameters:
+            grid(Grid): The read-only layout of the level.
+            positions(dict<str, frozenset<tuple<int, int>>> or PositionIndex): A prebuilt position index for the
+            grid, such as a CompiledLevel's, or None to find positions on the grid when they are asked for.
+            moves(int): The move budget stored with the level, if any.
+        """
+        self._grid = grid
+        self._positions = {} if positions is None else positions
+        self._sorted_positions = {}
+        self._moves = moves
+        self._entities = None
+        self._items = {}
+        self._passable = None
+        self._distance_fields = {}
+        self._static_rows = None
+
+    @classmethod
+    def from_file(cls, filename):
+        """
+        Parses a level from a text level file.
+
+        Parameters:
+            filename(str): The level file.
+
+        Returns:
+            Level: The parsed level.
+        """
+        return cls(load_grid(filename).freeze())
+
+    @classmethod
+    def from_compiled(cls, filename):
+        """
+        Reads a level from a compiled level file.
+
+        Parameters:
+            filename(str): The compiled level file.
+
+        Returns:
+            Level: The level, with the move budget stored in the file.
+        """
+        compiled = load_compiled(filename)
+        return cls(compiled.get_grid(), compiled.get_positions(), compiled.get_moves())
+
+    def get_grid(self):
+        """
+        Returns:
+            Grid: Return the read-only layout of the level.
+        """
+        return self._grid
+
+    def get_positions(self, entity):
+        """
+        Returns the positions of a given Entity id in the level as first loaded.
+
+        Parameters:
+            entity(str): The id of an Entity.
+
+        Returns:
+            frozenset<tuple<int, int>>: Return the positions holding that Entity.
+        """
+        positions = self._positions.get(entity)
+        if positions is None:
+            if entity == SPACE or not isinstance(self._positions, dict):
+                return frozenset()
+            positions = frozenset(self._grid.find_all(entity))
+            self._positions[entity] = positions
+        return positions
+
+    def get_sorted_positions(self, entity):
+        """
+        Returns the positions of a given Entity id in the level as first loaded, in row-major order. The order is
+        worked out once per level, so callers that need it do not sort on every call.
+
+        Parameters:
+            entity(str): The id of an Entity.
+
+        Returns:
+            tuple<tuple<int, int>>: Return the positions holding that Entity, sorted.
+        """
+        positions = self._sorted_positions.get(entity)
+        if positions is None:
+            positions = tuple(sorted(self.get_positions(entity)))
+            self._sorted_positions[entity] = positions
+        return positions
+
+    def get_entities(self):
+        """
+        Returns the position to Entity index of the level as first loaded, built on the first call. It is shared and
+        must not be modified; get_entity answers single lookups without it.
+
+        Returns:
+            dict<tuple<int, int>, Entity>: Return the Entity at each occupied position.
+        """
+        if self._entities is None:
+            entities = {}
+            for tile, entity in TILE_ENTITIES.items():
+                entities.update(dict.fromkeys(self.get_positions(tile), entity))
+            for tile in TILE_ITEMS:
+                entities.update((position, self.get_entity(position)) for position in self.get_positions(tile))
+            self._entities = entities
+        return self._entities
+
+    def get_entity(self, position):
+        """
+        Returns the Entity at a given position in the level as first loaded, or None.
+
+        Parameters:
+            position(tuple<int, int>): The position to look up.
+        """
+        tile = self._grid.get_tile(position)
+        entity = TILE_ENTITIES.get(tile)
+        if entity is None and tile in TILE_ITEMS:
+            entity = self._items.get(position)
+            if entity is None:
+                entity = self._items.setdefault(position, TILE_ITEMS[tile]())
+        return entity
+
+    def get_tile_entity(self, tile):
+        """
+        Returns an Entity like the one every cell holding a given tile id shows, or None for tiles without one: the
+        shared Entity of a wall or door, or a new Item that is not placed on the level.
+
+        Parameters:
+            tile(str): The tile id.
+        """
+        entity = TILE_ENTITIES.get(tile)
+        if entity is None and tile in TILE_ITEMS:
+            entity = TILE_ITEMS[tile]()
+        return entity
+
+    def get_moves(self):
+        """
+        Returns:
+            int or None: Return the move budget stored with the level, or None if it has none.
+        """
+        return self._moves
+
+    def get_passable(self):
+        """
+        Returns which tiles the Player can walk onto, computed once from the Entities on them.
+
+        Returns:
+            bytearray: Return a 256 entry table, non-zero for each tile byte that can be collided with.
+        """
+        if self._passable is None:
+            self._passable = passable_table(self)
+        return self._passable
+
+    def get_distance_field(self, entity):
+        """
+        Returns the number of moves needed to walk from every cell to the nearest Entity of a given id, computed once
+        per level (see GameLogic.get_distance_field).
+
+        Parameters:
+            entity(str): The id of the Entity to walk to.
+
+        Returns:
+            array<int>: Return the distance for each cell, indexed by row * width + col.
+        """
+        field = self._distance_fields.get(entity)
+        if field is None:
+            width = self._grid.get_width()
+            seeds = {row * width + col: 0 for row, col in self.get_positions(entity)}
+            field = distance_field(self._grid.to_bytes(), self.get_passable(), width, self._grid.get_height(), seeds)
+            self._distance_fields[entity] = field
+        return field
+
+    def get_static_rows(self):
+        """
+        Returns the rows of the level as Display draws them with no Player on the map and nothing collected: each
+        tile with an Entity is shown by the Entity's id and every other tile as a space.
+
+        The rows of a level read from a compiled buffer, such as a memory map or shared memory, are read from that
+        buffer as they are drawn (see GridRows), so no process keeps a private copy of the map. Other levels build
+        them once.
+
+        Returns:
+            tuple<str> or GridRows: Return one string per row.
+        """
+        if self._static_rows is None:
+            if isinstance(self._positions, PositionIndex):
+                patches = {}
+                for tile in self._positions:
+                    entity = self.get_tile_entity(tile)
+                    glyph = SPACE if entity is None else entity.get_id()
+                    if glyph != tile:
+                        patches.update(dict.fromkeys(self.get_positions(tile), glyph))
+                self._static_rows = GridRows(self._grid, patches)
+            else:
+                table = bytearray(SPACE * 256, 'latin-1')
+                for tile in (*TILE_ENTITIES, *TILE_ITEMS):
+                    table[ord(tile)] = ord(self.get_tile_entity(tile).get_id())
+                glyphs = self._grid.to_bytes().translate(table).decode('latin-1')
+                width = self._grid.get_width()
+                self._static_rows = tuple(glyphs[start:start + width] for start in range(0, len(glyphs), width))
+        return self._static_rows
+
+    def get_nbytes(self):
+        """
+        Returns an estimate of the memory held by the level, used by LEVEL_CACHE to bound its size. The indexes are
+        built lazily, so each occupied position is counted as the dictionary and set entries plus the tuple that it
+        will cost once they are, and each Item as its own instance too.
+
+        Returns:
+            int: Return the estimated size in bytes.
+        """
+        count = self._positions.count if isinstance(self._positions, PositionIndex) else self._grid.count
+        walls = sum(count(tile) for tile in TILE_ENTITIES)
+        items = sum(count(tile) for tile in TILE_ITEMS)
+        return self._grid.get_width() * self._grid.get_height() + 200 * walls + 260 * items
+
+
+def load_level(dungeon_name):
+    """
+    Returns the parsed level for a level file, reading and parsing the file only if LEVEL_CACHE does not already hold
+    an up to date copy.
+
+    Parameters:
+        dungeon_name(str): The level file.
+
+    Returns:
+        Level: The shared parsed level.
+    """
+    return LEVEL_CACHE.get(dungeon_name, Level.from_file)
+
+
+# Walls and doors carry no per-cell state, so every Level shares these
+# instances instead of allocating one Entity per tile. They must not be
+# mutated.
+WALL_TILE = Wall()
+DOOR_TILE = Door()
+
+# The shared Entity each wall or door tile id on a level's grid shows.
+TILE_ENTITIES = {
+    WALL: WALL_TILE,
+    DOOR: DOOR_TILE,
+}
+
+# The Item class each collectible tile id on a level's grid holds. Items
+# stay one per cell, so they can carry data of their own.
+TILE_ITEMS = {
+    KEY: Key,
+    MOVE_INCREASE: MoveIncrease,
+}
+
+
 def main():
     game = GameApp()
     game.play()
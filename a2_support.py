@@ -1,9 +1,88 @@
-GAME_LEVELS = {
-    # dungeon layout: max moves allowed
-    "game1.txt": 7,     
-    "game2.txt": 12,    
-    "game3.txt": 19,
-}
+import json
+import os
+import re
+import sys
+from contextlib import contextmanager
+
+# The level manifest: for each dungeon layout, the max moves allowed (see
+# calibrate.py, which computes them from the fewest moves needed to win).
+MANIFEST_NAME = "levels.json"
+MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), MANIFEST_NAME)
+
+
+def load_manifest(filename):
+    """Read the move budget of every level listed in a level manifest.
+
+    Parameters:
+        filename (str): The manifest file.
+
+    Returns:
+        (dict<str, int>): The max moves allowed for each dungeon layout.
+    """
+    with open(filename, 'r') as file:
+        levels = json.load(file)["levels"]
+    return {name: entry["moves"] for name, entry in levels.items()}
+
+
+GAME_LEVELS = load_manifest(MANIFEST)
+
+# Manifests other than MANIFEST read by level_moves, by path, with the
+# (mtime, size) they were read at.
+_manifests = {}
+
+
+def _manifest_levels(path):
+    """Returns the move budgets listed in a manifest, or None if there is no
+    such file. MANIFEST is answered from GAME_LEVELS; others are read once
+    and again only when they change.
+
+    Parameters:
+        path (str): The absolute path of the manifest.
+    """
+    if path == MANIFEST:
+        return GAME_LEVELS
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _manifests.get(path)
+    if cached is None or cached[0] != version:
+        cached = _manifests[path] = (version, load_manifest(path))
+    return cached[1]
+
+
+def level_moves(dungeon_name):
+    """Returns the move budget of a level file.
+
+    The budget comes from the nearest manifest in the level's directory or
+    above it that lists the level, under its path relative to the
+    manifest's directory (as calibrate.py and generate.py write them). So
+    "game1.txt", "./game1.txt" and an absolute path all name the same
+    level, and levels written to another directory are found in the
+    manifest written next to them.
+
+    Parameters:
+        dungeon_name (str): The level file.
+
+    Returns:
+        (int): The max moves allowed.
+
+    Raises:
+        KeyError: If no manifest lists the level.
+    """
+    path = os.path.abspath(dungeon_name)
+    directory = os.path.dirname(path)
+    while True:
+        levels = _manifest_levels(os.path.join(directory, MANIFEST_NAME))
+        if levels is not None:
+            name = os.path.relpath(path, directory).replace(os.sep, "/")
+            if name in levels:
+                return levels[name]
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            raise KeyError(dungeon_name)
+        directory = parent
 
 PLAYER = "O"
 KEY = "K"
@@ -22,6 +101,8 @@ DIRECTIONS = {
 INVESTIGATE = "I"
 QUIT = "Q"
 HELP = "H"
+# Not listed in VALID_ACTIONS, so the help message is unchanged.
+HINT = "HINT"
 
 VALID_ACTIONS = [INVESTIGATE, QUIT, HELP]
 VALID_ACTIONS.extend(list(DIRECTIONS.keys()))
@@ -34,31 +115,117 @@ WIN_TEXT = "You have won the game with your strength and honour!"
 
 LOSE_TEST = "You have lost all your strength and honour."
 
+NO_KEY_TEXT = "You don't have the key!"
+
+HINT_TEXT = "Try moving {}."
+NO_HINT_TEXT = "There is no way out from here."
+
+ACTION_PROMPT = "Please input an action: "
+QUIT_PROMPT = "Are you sure you want to quit? (y/n): "
+CONFIRM_QUIT = "y"
+
+# A line of several moves, each optionally preceded by a repeat count, such
+# as "DDWSS" or "5D". Other lines are single actions.
+MOVE_PATTERN = re.compile(f"([1-9][0-9]*)?([{''.join(DIRECTIONS)}])")
+BATCH_PATTERN = re.compile(f"(?:{MOVE_PATTERN.pattern})+")
+
+# Events reported by GameLogic.step, as (event, data) tuples.
+EVENT_MOVED = "moved"                  # data: the Player's new position
+EVENT_BLOCKED = "blocked"              # data: the direction of the wall
+EVENT_COLLECTED = "collected"          # data: the Item picked up
+EVENT_NO_KEY = "no_key"                # data: None
+EVENT_INVESTIGATED = "investigated"    # data: (direction, Entity or None)
+EVENT_HELP = "help"                    # data: None
+EVENT_HINT = "hint"                    # data: a direction, or None
+EVENT_CONFIRM_QUIT = "confirm_quit"    # data: None
+EVENT_INVALID = "invalid"              # data: the action
+
+def expand_command(line):
+    """Splits a line of input into the actions it stands for.
+
+    A batch of moves such as "DDWSS" or "5D" stands for each of its moves in
+    turn; any other line, including a single move, is one action. Repeat
+    counts are expanded lazily, so a large count costs nothing up front.
+
+    Parameters:
+        line (str): The line the player entered.
+
+    Returns:
+        (iterable<str>): The actions, in order.
+    """
+    if len(line) < 2 or BATCH_PATTERN.fullmatch(line) is None:
+        return (line,)
+    return (direction for count, direction in MOVE_PATTERN.findall(line)
+            for _ in range(int(count or 1)))
+
+
 class Display:
     """Display of the dungeon."""
 
-    def __init__(self, game_information, dungeon_size):
+    def __init__(self, game_information, dungeon_size, rows=None,
+                 cleared=()):
         """Construct a view of the dungeon.
 
         Parameters:
             game_information (dict<tuple<int, int>: Entity): Dictionary 
-                containing the position and the corresponding Entity
-            dungeon_size (int): the width of the dungeon.
+                containing the position and the corresponding Entity, or
+                any mapping with the same get (see GameLogic.get_entities)
+            dungeon_size (int | tuple<int, int>): the width of a square 
+                dungeon, or the (height, width) of a rectangular one.
+            rows (tuple<str> | GridRows): The dungeon's rows as drawn with
+                no Player and nothing collected (see Level.get_static_rows).
+                If given, only the rows that differ from them are rebuilt.
+            cleared (set<tuple<int, int>>): The positions of items that
+                have been collected since rows was built.
         """
         self._game_information = game_information
-        self._dungeon_size = dungeon_size
+        if isinstance(dungeon_size, int):
+            dungeon_size = (dungeon_size, dungeon_size)
+        self._height, self._width = dungeon_size
+        self._rows = rows
+        self._cleared = cleared
+
+    def render_game(self, player_pos):
+        """Returns the dungeon as display_game shows it.
+
+        Parameters:
+            player_pos (tuple<int, int>): The position of the Player
+        """
+        if self._rows is None:
+            return self._render_cells(player_pos)
+
+        changes = {}
+        for row, col in self._cleared:
+            changes.setdefault(row, {})[col] = SPACE
+        row, col = player_pos
+        if 0 <= row < self._height and 0 <= col < self._width \
+                and self._game_information.get(player_pos) is None:
+            changes.setdefault(row, {})[col] = PLAYER
+
+        rows = list(self._rows)
+        for row, glyphs in changes.items():
+            line = rows[row]
+            pieces = []
+            start = 0
+            for col in sorted(glyphs):
+                pieces.append(line[start:col])
+                pieces.append(glyphs[col])
+                start = col + 1
+            pieces.append(line[start:])
+            rows[row] = "".join(pieces)
+        return "\n".join(rows)
+
+    def _render_cells(self, player_pos):
+        """Returns the dungeon built cell by cell from the game information.
 
-    def display_game(self, player_pos):
-        """Displays the dungeon.
-        
         Parameters:
             player_pos (tuple<int, int>): The position of the Player
         """
         dungeon = ""
 
-        for i in range(self._dungeon_size):
+        for i in range(self._height):
             rows = ""
-            for j in range(self._dungeon_size):
+            for j in range(self._width):
                 position = (i, j)
                 entity = self._game_information.get(position)
 
@@ -69,10 +236,26 @@ class Display:
                 else:
                     char = SPACE
                 rows += char
-            if i < self._dungeon_size - 1:
+            if i < self._height - 1:
                 rows += "\n"
             dungeon += rows
-        print(dungeon)
+        return dungeon
+
+    def render_moves(self, moves):
+        """Returns the moves left as display_moves shows them.
+
+        Parameters:
+            moves (int): The number of moves the Player can preform.
+        """
+        return f"Moves left: {moves}" + "\n"
+
+    def display_game(self, player_pos):
+        """Displays the dungeon.
+        
+        Parameters:
+            player_pos (tuple<int, int>): The position of the Player
+        """
+        print(self.render_game(player_pos))
 
     def display_moves(self, moves):
         """Displays the number of moves the Player has left.
@@ -80,7 +263,87 @@ class Display:
         Parameters:
             moves (int): THe number of moves the Player can preform. 
         """
-        print(f"Moves left: {moves}" + "\n")
+        print(self.render_moves(moves))
+
+
+class NullSink:
+    """A stream that discards everything written to it, for headless runs."""
+
+    def write(self, text):
+        """Discards text.
+
+        Parameters:
+            text (str): The text to discard.
+        """
+        return len(text)
+
+    def flush(self):
+        """Does nothing."""
+
+
+NULL_SINK = NullSink()
+
+
+class FrameWriter:
+    """Collects the output of a turn and writes it to a stream at once.
+
+    Outside a batch, text is written to the stream as soon as it arrives.
+    Inside one, it is held until flush() or the end of the batch and then
+    written with a single write, so a whole turn (messages, the dungeon,
+    the moves left and the next prompt) costs one write and one flush.
+    """
+
+    __slots__ = ("_stream", "_parts", "_batches")
+
+    def __init__(self, stream=None):
+        """Construct a writer.
+
+        Parameters:
+            stream (io.TextIOBase): Where output goes. None means whatever
+                sys.stdout is at the time of writing; NULL_SINK discards it.
+        """
+        self._stream = stream
+        self._parts = []
+        self._batches = 0
+
+    def write(self, text):
+        """Writes text, or holds it until the batch is flushed.
+
+        Parameters:
+            text (str): The text to write.
+        """
+        if self._batches:
+            if self._stream is not NULL_SINK:
+                self._parts.append(text)
+        else:
+            self._emit(text)
+
+    def flush(self):
+        """Writes all held text with a single write."""
+        if self._parts:
+            text = "".join(self._parts)
+            self._parts.clear()
+            self._emit(text)
+
+    @contextmanager
+    def batch(self):
+        """Holds written text until flush() or the end of the with block."""
+        self._batches += 1
+        try:
+            yield self
+        finally:
+            self._batches -= 1
+            self.flush()
+
+    def _emit(self, text):
+        """Writes text to the stream and flushes it.
+
+        Parameters:
+            text (str): The text to write.
+        """
+        stream = sys.stdout if self._stream is None else self._stream
+        stream.write(text)
+        stream.flush()
 
 def load_game(filename):
     """Create a 2D array of string representing the dungeon to display.
@@ -104,4 +367,243 @@ def load_game(filename):
             row.append(line[j])
         dungeon_layout.append(row)
     
-    return dungeon_layout
\ No newline at end of file
+    return dungeon_layout
+
+
+class Grid:
+    """A dungeon layout stored as one byte per tile in a flat bytearray.
+
+    Cells are addressed by (row, col) and stored row-major, so the tile at
+    (row, col) lives at index row * width + col. Reading a cell does not
+    allocate any per-cell Python objects.
+    """
+
+    __slots__ = ("_cells", "_width", "_height")
+
+    def __init__(self, width, height, cells=None):
+        """Construct a grid of the given size.
+
+        Parameters:
+            width (int): The number of columns in the grid.
+            height (int): The number of rows in the grid.
+            cells (bytearray): Row-major tile bytes, one per cell. Defaults
+                to a grid filled with SPACE. Read-only grids may hold bytes or
+                a memoryview, e.g. of shared memory.
+        """
+        if cells is None:
+            cells = bytearray(SPACE, "latin-1") * (width * height)
+        self._cells = cells
+        self._width = width
+        self._height = height
+
+    def get_width(self):
+        """Returns the number of columns in the grid."""
+        return self._width
+
+    def get_height(self):
+        """Returns the number of rows in the grid."""
+        return self._height
+
+    def in_bounds(self, position):
+        """Returns True if the position lies on the grid.
+
+        Parameters:
+            position (tuple<int, int>): The (row, col) to check.
+        """
+        row, col = position
+        return 0 <= row < self._height and 0 <= col < self._width
+
+    def get_tile(self, position):
+        """Returns the tile id at the given position, or None if off the grid.
+
+        Parameters:
+            position (tuple<int, int>): The (row, col) to read.
+        """
+        row, col = position
+        if 0 <= row < self._height and 0 <= col < self._width:
+            return chr(self._cells[row * self._width + col])
+        return None
+
+    def set_tile(self, position, tile):
+        """Replaces the tile at the given position.
+
+        Parameters:
+            position (tuple<int, int>): The (row, col) to write.
+            tile (str): The one character tile id to store.
+        """
+        row, col = position
+        self._cells[row * self._width + col] = ord(tile)
+
+    def get_row(self, row):
+        """Returns one row of the grid as a string.
+
+        Parameters:
+            row (int): The index of the row.
+        """
+        start = row * self._width
+        return str(self._cells[start:start + self._width], "latin-1")
+
+    def freeze(self):
+        """Returns a read-only grid holding this grid's tiles.
+
+        The tiles are not copied: the new grid reads them through a
+        read-only memoryview, so set_tile on it raises TypeError. This grid
+        must not be changed afterwards, as the change would show through.
+        """
+        return Grid(self._width, self._height,
+                    memoryview(self._cells).toreadonly())
+
+    def _buffer(self):
+        """Returns the tiles as bytes or a bytearray, to search them.
+
+        A view of a whole bytes or bytearray gives that object rather than
+        a copy; any other view is copied.
+        """
+        cells = self._cells
+        if isinstance(cells, memoryview):
+            if isinstance(cells.obj, (bytes, bytearray)) \
+                    and cells.nbytes == len(cells.obj):
+                return cells.obj
+            return bytes(cells)
+        return cells
+
+    def to_bytes(self):
+        """Returns the row-major tile bytes of the whole grid."""
+        return bytes(self._cells)
+
+    def get_tiles(self):
+        """Returns the set of tile ids that appear on the grid."""
+        return {chr(byte) for byte in set(self._buffer())}
+
+    def find_all(self, tile):
+        """Returns the positions of every cell holding the given tile.
+
+        Parameters:
+            tile (str): The one character tile id to look for.
+
+        Returns:
+            (list<tuple<int, int>>): The matching positions in row-major
+                order.
+        """
+        positions = []
+        needle = ord(tile)
+        width = self._width
+        cells = self._buffer()
+        index = cells.find(needle)
+        while index != -1:
+            positions.append(divmod(index, width))
+            index = cells.find(needle, index + 1)
+        return positions
+
+    def count(self, tile):
+        """Returns the number of cells holding the given tile.
+
+        Parameters:
+            tile (str): The one character tile id to count.
+        """
+        return self._buffer().count(ord(tile))
+
+    def __len__(self):
+        """Returns the number of rows in the grid."""
+        return self._height
+
+
+class GridRows:
+    """The rows of a Grid as strings, read from the grid each time one is
+    asked for rather than kept, with some cells shown as other characters.
+
+    A level whose grid lives in shared memory or a memory map draws from
+    these, so no process holds its own copy of the map's rows.
+    """
+
+    __slots__ = ("_grid", "_patches")
+
+    def __init__(self, grid, patches=None):
+        """Construct the rows of a grid.
+
+        Parameters:
+            grid (Grid): The grid to read.
+            patches (dict<tuple<int, int>, str>): The character to show
+                instead of the tile at each of these cells.
+        """
+        self._grid = grid
+        self._patches = {}
+        for (row, col), char in (patches or {}).items():
+            self._patches.setdefault(row, {})[col] = char
+
+    def __len__(self):
+        """Returns the number of rows."""
+        return self._grid.get_height()
+
+    def __getitem__(self, row):
+        """Returns one row as a string.
+
+        Parameters:
+            row (int): The index of the row.
+        """
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("row out of range")
+        line = self._grid.get_row(row)
+        chars = self._patches.get(row)
+        if chars:
+            line = list(line)
+            for col, char in chars.items():
+                line[col] = char
+            line = "".join(line)
+        return line
+
+    def __iter__(self):
+        """Iterates over the rows, from the top."""
+        return (self[row] for row in range(len(self)))
+
+
+def measure_level(filename):
+    """Measure the dimensions of a dungeon file without keeping its contents.
+
+    Trailing blank lines are ignored. The width is the length of the
+    longest row, so ragged files are reported by their bounding box.
+
+    Parameters:
+        filename (str): A string representing the name of the level.
+
+    Returns:
+        (tuple<int, int>): The (height, width) of the dungeon.
+    """
+    height = width = 0
+    with open(filename, 'r') as file:
+        for row, line in enumerate(file):
+            length = len(line.rstrip("\r\n"))
+            if length:
+                height = row + 1
+                width = max(width, length)
+    return height, width
+
+
+def load_grid(filename):
+    """Create a compact Grid representing the dungeon.
+
+    The file is streamed line by line twice: once to measure it and once
+    to copy each row into a preallocated grid, so loading needs no more
+    memory than the grid itself. Levels need not be square; rows shorter
+    than the widest one are padded with walls.
+
+    Parameters:
+        filename (str): A string representing the name of the level.
+
+    Returns:
+        (Grid): The dungeon layout.
+    """
+    height, width = measure_level(filename)
+    cells = bytearray(WALL, "latin-1") * (width * height)
+
+    with open(filename, 'r') as file:
+        for row, line in enumerate(file):
+            if row == height:
+                break
+            line = line.rstrip("\r\n")
+            start = row * width
+            cells[start:start + len(line)] = line.encode("latin-1")
+
+    return Grid(width, height, cells)
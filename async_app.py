@@ -0,0 +1,203 @@
+"""Play games over asyncio streams, many to one event loop.
+
+AsyncGameApp plays GameApp.play's turn loop (a2.play_turns) as a
+coroutine: it reads each line from an asyncio.StreamReader and writes
+each turn (messages, the dungeon, the moves left and the next prompt) to
+a StreamWriter with one write. The text is exactly what GameApp.play
+prints, and the game is played by an
+unchanged GameLogic, so a session over a socket or pipe behaves like one
+at the terminal. All per-player state lives in the AsyncGameApp and its
+GameLogic, so one event loop can run thousands of sessions at once
+without a thread per player.
+
+Usage:
+    python async_app.py game1.txt test_data/game_win.in --sessions 5000
+"""
+
+import argparse
+import asyncio
+import time
+
+from a2 import GameLogic, play_turns, render_frame
+from a2_support import *
+
+ENCODING = "utf-8"
+
+
+class AsyncGameApp:
+    """Plays one game over a pair of asyncio streams."""
+
+    def __init__(self, game, reader, writer, idle_timeout=None):
+        """Construct a session.
+
+        Parameters:
+            game (GameLogic): The game to play.
+            reader (asyncio.StreamReader): Where the player's lines come from.
+            writer (asyncio.StreamWriter): Where output goes.
+            idle_timeout (float): Seconds to wait for a line before giving
+                up with asyncio.TimeoutError, or None to wait forever.
+        """
+        self._game = game
+        self._reader = reader
+        self._writer = writer
+        self._idle_timeout = idle_timeout
+        self._parts = []
+        self._actions = 0
+
+    def get_game(self):
+        """Returns the game being played."""
+        return self._game
+
+    def get_actions(self):
+        """Returns the number of lines the player has entered."""
+        return self._actions
+
+    async def play(self):
+        """Plays the game until it ends, the player quits or input ends.
+
+        The game is looked up with get_game() whenever it is needed rather
+        than held while waiting for input, so a subclass may hand out a
+        different but equal game after each wait.
+
+        Raises:
+            EOFError: If the stream ends before the game does.
+            asyncio.TimeoutError: If no line arrives within idle_timeout.
+        """
+        turns = play_turns(self)
+        try:
+            prompt = next(turns)
+            while True:
+                prompt = turns.send(await self.read_action(prompt))
+        except StopIteration:
+            pass
+        finally:
+            self.flush()
+        await self._writer.drain()
+
+    def step(self, action):
+        """Plays one action on the game.
+
+        Parameters:
+            action (str): The action.
+
+        Returns:
+            (StepResult): What happened.
+        """
+        return self.get_game().step(action)
+
+    async def read_action(self, prompt):
+        """Sends the turn's output and a prompt, then waits for a line.
+
+        Parameters:
+            prompt (str): The prompt to show.
+
+        Returns:
+            (str): The line, without its line ending.
+        """
+        self._parts.append(prompt)
+        self.flush()
+        await self._writer.drain()
+        if self._idle_timeout is None:
+            line = await self._reader.readline()
+        else:
+            line = await asyncio.wait_for(self._reader.readline(),
+                                          self._idle_timeout)
+        if not line:
+            raise EOFError("the player's stream ended")
+        self._actions += 1
+        return line.decode(ENCODING, "replace").rstrip("\r\n")
+
+    def show_message(self, text):
+        """Adds a message to this turn's output.
+
+        Parameters:
+            text (str): The message to show.
+        """
+        self._parts.append(text + "\n")
+
+    def draw(self):
+        """Adds the dungeon and the moves left to this turn's output."""
+        self._parts.append(render_frame(self.get_game()))
+
+    def flush(self):
+        """Writes this turn's output with a single write."""
+        if self._parts:
+            self._writer.write("".join(self._parts).encode(ENCODING))
+            self._parts.clear()
+
+
+class CountingWriter:
+    """A stand-in for asyncio.StreamWriter that counts and discards output.
+
+    drain() yields to the event loop, as a real drain does when the
+    transport's buffer is full, so sessions writing to it take turns.
+    """
+
+    def __init__(self):
+        """Construct a writer that has written nothing."""
+        self._bytes = 0
+
+    def get_bytes(self):
+        """Returns the number of bytes written."""
+        return self._bytes
+
+    def write(self, data):
+        """Counts and discards data.
+
+        Parameters:
+            data (bytes): The data written.
+        """
+        self._bytes += len(data)
+
+    async def drain(self):
+        """Lets other tasks run."""
+        await asyncio.sleep(0)
+
+
+async def run_sessions(level, lines, sessions):
+    """Plays the same input in many concurrent sessions on one event loop.
+
+    Parameters:
+        level (str): The level file.
+        lines (list<str>): The lines every player enters.
+        sessions (int): The number of sessions.
+
+    Returns:
+        (list<AsyncGameApp>): The finished sessions.
+    """
+    template = GameLogic(level)
+    data = "".join(line + "\n" for line in lines).encode(ENCODING)
+    apps = []
+    for _ in range(sessions):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        apps.append(AsyncGameApp(template.fork(), reader, CountingWriter()))
+    await asyncio.gather(*(app.play() for app in apps),
+                         return_exceptions=True)
+    return apps
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play a transcript in many concurrent sessions on one "
+                    "event loop.")
+    parser.add_argument("level", help="level file")
+    parser.add_argument("transcript", help="file of input lines")
+    parser.add_argument("--sessions", type=int, default=1000,
+                        help="number of concurrent sessions")
+    args = parser.parse_args()
+
+    with open(args.transcript, "r") as file:
+        lines = file.read().splitlines()
+    start = time.perf_counter()
+    apps = asyncio.run(run_sessions(args.level, lines, args.sessions))
+    elapsed = time.perf_counter() - start
+    won = sum(app.get_game().won() for app in apps)
+    actions = sum(app.get_actions() for app in apps)
+    print(f"{len(apps)} sessions, {won} won, {actions} lines in "
+          f"{elapsed:.2f} s ({actions / elapsed:.0f} lines/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Replay recorded input transcripts headlessly and score them.
+
+A transcript is a text file holding what a player typed into GameApp.play,
+one action per line (like the test_data/*.in files). Transcripts are
+replayed through GameLogic.step across a pool of worker processes and one
+JSON object per transcript is written as soon as it is scored:
+
+    {"transcript": "test_data/game_win.in", "outcome": "won",
+     "moves_used": 6, "moves_left": 1, "position": [3, 2], "actions": 6}
+
+outcome is one of "won", "lost", "quit" or "unfinished" (the transcript
+ran out before the game ended).
+
+Usage:
+    python batch_replay.py game1.txt test_data/ -o results.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from a2 import GameLogic
+from a2_support import *
+from level_format import COMPILED_SUFFIX
+
+TRANSCRIPT_SUFFIX = ".in"
+
+# Events that cost the player a move.
+MOVE_EVENTS = frozenset((EVENT_MOVED, EVENT_BLOCKED, EVENT_INVESTIGATED))
+
+# The game every transcript in this process starts from. Set once per worker
+# by _init_worker so the level is parsed once, never per transcript.
+_template = None
+
+
+def new_game(level, moves=None):
+    """Start a game on a text or compiled level file.
+
+    Parameters:
+        level (str): The level file. Files ending in COMPILED_SUFFIX are read
+            with GameLogic.from_compiled.
+        moves (int): Overrides the level's move budget if given.
+
+    Returns:
+        (GameLogic): The new game.
+    """
+    if level.endswith(COMPILED_SUFFIX):
+        game = GameLogic.from_compiled(level)
+    else:
+        game = GameLogic(level)
+    if moves is not None:
+        player = game.get_player()
+        player.change_move_count(moves - player.moves_remaining())
+    return game
+
+
+def replay(game, actions):
+    """Play a sequence of actions until they run out or the game ends.
+
+    Lines holding a batch of moves (see expand_command) are played move by
+    move, as GameApp.play plays them. A line answering the quit prompt is
+    played as typed, never expanded, as GameApp.play reads it.
+
+    Parameters:
+        game (GameLogic): The game to play. It is modified in place.
+        actions (iterable<str>): The lines the player typed.
+
+    Returns:
+        (dict): The outcome, moves used and left, final position and number
+            of actions consumed.
+    """
+    played = moves_used = 0
+    outcome = "unfinished"
+    for line in actions:
+        played += 1
+        if game.is_confirming_quit():
+            line_actions = (line,)
+        else:
+            line_actions = expand_command(line)
+        for action in line_actions:
+            result = game.step(action)
+            for event, _ in result.get_events():
+                if event in MOVE_EVENTS:
+                    moves_used += 1
+                    break
+            if result.is_over():
+                break
+        if game.is_over():
+            break
+
+    if game.won():
+        outcome = "won"
+    elif game.has_quit():
+        outcome = "quit"
+    elif game.check_game_over():
+        outcome = "lost"
+
+    player = game.get_player()
+    return {
+        "outcome": outcome,
+        "moves_used": moves_used,
+        "moves_left": player.moves_remaining(),
+        "position": list(player.get_position()),
+        "actions": played,
+    }
+
+
+def _init_worker(level, moves):
+    """Load the level once for this worker process.
+
+    Parameters:
+        level (str): The level file.
+        moves (int): The move budget override, or None.
+    """
+    global _template
+    _template = new_game(level, moves)
+
+
+def _replay_file(filename):
+    """Replay one transcript file on a fork of this process's template game.
+
+    Parameters:
+        filename (str): The transcript file.
+
+    Returns:
+        (dict): The replay result, tagged with the transcript name.
+    """
+    with open(filename, "r") as file:
+        actions = file.read().splitlines()
+    result = {"transcript": filename}
+    result.update(replay(_template.fork(), actions))
+    return result
+
+
+def find_transcripts(paths):
+    """Expand directories into the transcript files they contain.
+
+    Parameters:
+        paths (list<str>): Transcript files and directories of them.
+
+    Returns:
+        (list<str>): The transcript files, directories sorted by name.
+    """
+    transcripts = []
+    for path in paths:
+        if os.path.isdir(path):
+            transcripts.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.endswith(TRANSCRIPT_SUFFIX)))
+        else:
+            transcripts.append(path)
+    return transcripts
+
+
+def replay_all(level, transcripts, moves=None, workers=None, chunksize=64):
+    """Replay transcripts in parallel, yielding results in input order.
+
+    The level is loaded in this process before the pool starts, so workers
+    created by fork inherit it through LEVEL_CACHE; each worker then builds
+    a single template game and forks it for every transcript.
+
+    Parameters:
+        level (str): The level file.
+        transcripts (list<str>): The transcript files.
+        moves (int): The move budget override, or None.
+        workers (int): The number of worker processes (default: CPU count).
+        chunksize (int): Transcripts handed to a worker at a time.
+
+    Yields:
+        (dict): One result per transcript.
+    """
+    new_game(level, moves)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(level, moves)) as executor:
+        yield from executor.map(_replay_file, transcripts,
+                                chunksize=chunksize)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay input transcripts headlessly and score them.")
+    parser.add_argument("level", help="level file (text or compiled)")
+    parser.add_argument("transcripts", nargs="+",
+                        help="transcript files or directories of them")
+    parser.add_argument("-o", "--output",
+                        help="JSON Lines file to write (default: stdout)")
+    parser.add_argument("--moves", type=int,
+                        help="override the level's move budget")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=64,
+                        help="transcripts sent to a worker at a time")
+    args = parser.parse_args()
+
+    transcripts = find_transcripts(args.transcripts)
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for result in replay_all(args.level, transcripts, args.moves,
+                                 args.workers, args.chunksize):
+            output.write(json.dumps(result) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark drawing the dungeon cell by cell against cached static rows.
+
+Generates square caves of the requested sizes (see bench_level_format),
+starts a game on each and collects the key so the game has a collected
+item to draw, then shows one frame with Display.display_game:
+
+    cells   the original Display, building every row cell by cell from
+            the dictionary get_game_information returns
+    rows    Display patching the level's cached static rows, rebuilding
+            only the rows holding the Player or a collected item
+
+Frames are printed to a stream that discards them. For each it reports
+the best time of a frame, the peak bytes traced by tracemalloc while
+drawing it, and the number of memory blocks allocated while drawing it
+that are still held when the frame is printed, counted from a
+tracemalloc snapshot taken at that moment.
+"""
+
+import argparse
+import os
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+
+from a2 import GameLogic, load_level
+from a2_support import *
+from bench_level_format import best_of, write_cave
+
+
+class SnapshotSink(NullSink):
+    """A stream that discards what is written to it, counting the memory
+    blocks traced at the time of each write."""
+
+    def __init__(self):
+        """Construct a sink that has counted no blocks."""
+        self.blocks = 0
+
+    def write(self, text):
+        """Discards text after counting the traced memory blocks.
+
+        Parameters:
+            text (str): The text written.
+        """
+        statistics = tracemalloc.take_snapshot().statistics("filename")
+        self.blocks = max(self.blocks, sum(stat.count for stat in statistics))
+
+
+def peak_bytes(func):
+    """Returns the peak memory in bytes traced while func runs."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def blocks_held(func):
+    """Returns the most memory blocks func has allocated and still holds
+    when it prints."""
+    sink = SnapshotSink()
+    with redirect_stdout(sink):
+        tracemalloc.start()
+        try:
+            func()
+        finally:
+            tracemalloc.stop()
+    return sink.blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'cells ms':>10} {'rows ms':>10} {'speed-up':>9} "
+          f"{'cells peak B':>13} {'rows peak B':>12} "
+          f"{'cells blocks':>13} {'rows blocks':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            text = os.path.join(directory, f"cave{size}.txt")
+            write_cave(text, size)
+            game = GameLogic.from_level(load_level(text), size * size)
+            game.step("D")
+
+            information = game.get_game_information()
+            dimensions = game.get_dungeon_dimensions()
+            player = game.get_player().get_position()
+            rows = game.get_static_rows()
+            collected = game.get_collected()
+
+            def cells():
+                Display(information, dimensions).display_game(player)
+
+            def cached():
+                Display(information, dimensions, rows,
+                        collected).display_game(player)
+
+            assert Display(information, dimensions).render_game(player) == \
+                Display(information, dimensions, rows,
+                        collected).render_game(player)
+            with redirect_stdout(NullSink()):
+                cells_ms = best_of(cells, args.repeat)
+                rows_ms = best_of(cached, args.repeat)
+                peaks = peak_bytes(cells), peak_bytes(cached)
+            print(f"{size:>6} {cells_ms:>10.3f} {rows_ms:>10.3f} "
+                  f"{cells_ms / rows_ms:>8.0f}x "
+                  f"{peaks[0]:>13} {peaks[1]:>12} "
+                  f"{blocks_held(cells):>13} {blocks_held(cached):>12}")
+
+
+if __name__ == "__main__":
+    main()
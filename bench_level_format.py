@@ -0,0 +1,93 @@
+"""Benchmark loading levels from text against compiled level files.
+
+Generates square open caves of the requested sizes in a temporary
+directory, compiles each one and times:
+
+    load_game       the original list-of-lists text loader
+    load_grid       the streaming Grid text loader
+    load_compiled   the memory-mapped binary loader
+    GameLogic       a full game start from text and from the compiled file
+                    with LEVEL_CACHE cleared, and a start served by the cache
+"""
+
+import argparse
+import os
+import tempfile
+import timeit
+
+import a2
+from a2_support import *
+from calibrate import write_manifest
+from level_cache import LEVEL_CACHE
+from level_format import COMPILED_SUFFIX, compile_level, load_compiled
+
+
+def write_cave(filename, size):
+    """Write a square cave of the given size with a wall every few cells.
+
+    Parameters:
+        filename (str): The level file to write.
+        size (int): The width and height of the cave.
+    """
+    with open(filename, "w") as file:
+        for row in range(size):
+            if row in (0, size - 1):
+                line = WALL * size
+            else:
+                cells = [WALL if col % 7 == 3 and row % 5 else SPACE
+                         for col in range(size)]
+                cells[0] = cells[-1] = WALL
+                if row == 1:
+                    cells[1], cells[2], cells[-2] = PLAYER, KEY, DOOR
+                line = "".join(cells)
+            file.write(line + "\n")
+
+
+def best_of(func, repeat):
+    """Returns the fastest of `repeat` timed runs of func in milliseconds."""
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+
+def cold(func):
+    """Wraps func so that every call starts with an empty LEVEL_CACHE."""
+    def run():
+        LEVEL_CACHE.clear()
+        func()
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'load_game':>10} {'load_grid':>10} "
+          f"{'compiled':>10} {'game/text':>10} {'game/kcl':>10} "
+          f"{'game/cache':>10}  (ms)")
+    entries = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            text = os.path.join(directory, f"cave{size}.txt")
+            binary = os.path.join(directory, f"cave{size}{COMPILED_SUFFIX}")
+            write_cave(text, size)
+            compile_level(text, binary, size * size)
+            entries[os.path.basename(text)] = {"moves": size * size}
+            write_manifest(os.path.join(directory, MANIFEST_NAME), entries,
+                           0)
+
+            timings = [
+                best_of(lambda: load_game(text), args.repeat),
+                best_of(lambda: load_grid(text), args.repeat),
+                best_of(lambda: load_compiled(binary), args.repeat),
+                best_of(cold(lambda: a2.GameLogic(text)), args.repeat),
+                best_of(cold(lambda: a2.GameLogic.from_compiled(binary)),
+                        args.repeat),
+                best_of(lambda: a2.GameLogic(text), args.repeat),
+            ]
+            print(f"{size:>6} " + " ".join(f"{t:>10.3f}" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Benchmark how the sharded server's throughput scales with its workers.
+
+For each worker count from 1 to --max-workers, starts shard_server.py on
+the level and drives it for --duration seconds with --players simulated
+players (see loadgen), spread over --clients load generator processes so
+that the players are not limited to one core either. Reports the lines
+per second the players got, the speed-up over one worker and the players'
+p50 and p99 round-trip times.
+
+Throughput can only scale while there are idle cores for the workers: the
+server and the load generators share the machine, so leave at least
+--clients cores free on top of the workers being measured.
+
+Usage:
+    python bench_shards.py game2.txt --max-workers 4 --players 400
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import loadgen
+from server import DEFAULT_HOST, percentile
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      "shard_server.py")
+STARTUP_TIMEOUT = 10
+
+
+def wait_for_port(host, port, timeout=STARTUP_TIMEOUT):
+    """Waits until something accepts connections on a port.
+
+    Parameters:
+        host (str): The address.
+        port (int): The port.
+        timeout (float): Seconds to wait before giving up.
+
+    Raises:
+        TimeoutError: If nothing listens in time.
+    """
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"nothing is listening on port {port}")
+            time.sleep(0.05)
+
+
+def _drive(host, port, players, duration, seed, think):
+    """Runs one load generator process's players (see loadgen.run)."""
+    latencies, _, elapsed = asyncio.run(loadgen.run(
+        host, port, players, duration, seed, think))
+    return latencies, elapsed
+
+
+def measure(level, workers, host, port, players, clients, duration, think):
+    """Starts a sharded server and measures it under load.
+
+    Parameters:
+        level (str): The level the server plays.
+        workers (int): The server's worker processes.
+        host (str): The address to serve on.
+        port (int): The port to serve on.
+        players (int): The simulated players, in total.
+        clients (int): The load generator processes to spread them over.
+        duration (float): Seconds to drive the server for.
+        think (float): Seconds each player waits before each move.
+
+    Returns:
+        (tuple<float, list<float>>): The lines per second, and the sorted
+            round-trip times.
+    """
+    server = subprocess.Popen(
+        [sys.executable, SERVER, level, "--host", host, "--port", str(port),
+         "--workers", str(workers), "--stats-interval", "0"])
+    try:
+        wait_for_port(host, port)
+        shares = [players // clients + (client < players % clients)
+                  for client in range(clients)]
+        with ProcessPoolExecutor(max_workers=clients) as executor:
+            results = list(executor.map(
+                _drive, *zip(*((host, port, share, duration,
+                                client * players, think)
+                               for client, share in enumerate(shares)))))
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait()
+
+    latencies = sorted(latency for found, _ in results for latency in found)
+    elapsed = max(elapsed for _, elapsed in results)
+    return len(latencies) / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("level", nargs="?", default="game2.txt",
+                        help="level file every session plays")
+    parser.add_argument("--max-workers", type=int,
+                        default=os.cpu_count() or 1)
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=2,
+                        help="load generator processes")
+    parser.add_argument("--duration", type=float, default=5,
+                        help="seconds to measure each worker count for")
+    parser.add_argument("--think", type=float, default=0,
+                        help="seconds each player waits before each move")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=4100)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores, {args.players} players over "
+          f"{args.clients} load generators")
+    print(f"{'workers':>7} {'lines/s':>10} {'speed-up':>9} "
+          f"{'p50 ms':>8} {'p99 ms':>8}")
+    base = None
+    for workers in range(1, args.max_workers + 1):
+        rate, latencies = measure(args.level, workers, args.host, args.port,
+                                  args.players, args.clients, args.duration,
+                                  args.think)
+        base = base or rate
+        print(f"{workers:>7} {rate:>10.0f} {rate / base:>8.2f}x "
+              f"{percentile(latencies, 0.50) * 1000:>8.2f} "
+              f"{percentile(latencies, 0.99) * 1000:>8.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Compute move budgets for levels and write them to the level manifest.
+
+For every level file in a directory the fewest moves a player must be
+given to win it is found with the solver (collecting MoveIncrease items
+can make this smaller than the length of the shortest route). The level's
+budget is that minimum plus a configurable slack. Levels are solved in
+parallel, one per worker process.
+
+The manifest is JSON:
+
+    {"slack": 1,
+     "levels": {"game1.txt": {"min_moves": 6, "moves": 7}, ...}}
+
+Level names are relative to the manifest's directory. Levels that are
+already in the manifest keep their budget unless --retune is given, so
+published levels do not change under players; a warning is printed for
+any level whose budget is too small to win. An entry may also carry a
+"note" saying why its budget was kept as it is; it is left untouched.
+
+Usage:
+    python calibrate.py . --slack 1
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from a2 import GameLogic, load_level
+from a2_support import *
+from solver import solve
+
+DEFAULT_PATTERN = "game*.txt"
+DEFAULT_SLACK = 1
+
+
+def min_moves(filename):
+    """Find the smallest move budget with which a level file can be won.
+
+    Parameters:
+        filename (str): The level file.
+
+    Returns:
+        (int): The smallest winning budget, or None if the level cannot be
+            won with any budget.
+    """
+    return level_min_moves(load_level(filename))
+
+
+def level_min_moves(level):
+    """Find the smallest move budget with which a parsed level can be won.
+
+    Parameters:
+        level (Level): The level.
+
+    Returns:
+        (int): The smallest winning budget, or None if the level cannot be
+            won with any budget.
+    """
+    shortest = solve(GameLogic.from_level(level, 0), limit_moves=False)
+    if shortest is None:
+        return None
+
+    extra = sum(level.get_entity(position).moves
+                for position in level.get_positions(MOVE_INCREASE))
+    low, high = max(1, shortest.get_moves() - extra), shortest.get_moves()
+    while low < high:
+        middle = (low + high) // 2
+        if solve(GameLogic.from_level(level, middle)) is None:
+            low = middle + 1
+        else:
+            high = middle
+    return high
+
+
+def _min_moves_for(filename):
+    """Returns (filename, min_moves(filename)) for use with executor.map.
+
+    Parameters:
+        filename (str): The level file.
+    """
+    return filename, min_moves(filename)
+
+
+def find_levels(directory, pattern=DEFAULT_PATTERN):
+    """List the level files in a directory.
+
+    Parameters:
+        directory (str): The directory to search.
+        pattern (str): The glob pattern level file names match.
+
+    Returns:
+        (list<str>): The matching files, sorted by name.
+    """
+    return sorted(os.path.join(directory, name)
+                  for name in os.listdir(directory)
+                  if fnmatch.fnmatch(name, pattern))
+
+
+def calibrate(levels, manifest, slack=DEFAULT_SLACK, retune=False,
+              workers=None):
+    """Solve levels in parallel and update the manifest with their budgets.
+
+    Parameters:
+        levels (list<str>): The level files.
+        manifest (str): The manifest file. It is created if missing.
+        slack (int): Moves allowed on top of the minimum.
+        retune (bool): Also replace the budgets of levels already listed.
+        workers (int): Worker processes (default: CPU count).
+
+    Returns:
+        (dict): The manifest as written.
+    """
+    entries = read_manifest_entries(manifest)
+    base = os.path.dirname(os.path.abspath(manifest))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for filename, moves in executor.map(_min_moves_for, levels):
+            name = os.path.relpath(os.path.abspath(filename),
+                                   base).replace(os.sep, "/")
+            if moves is None:
+                print(f"{name}: cannot be won, not added", file=sys.stderr)
+                continue
+            entry = entries.setdefault(name, {})
+            entry["min_moves"] = moves
+            if retune or "moves" not in entry:
+                entry["moves"] = moves + slack
+            elif entry["moves"] < moves:
+                print(f"{name}: budget {entry['moves']} is below the {moves} "
+                      f"moves needed to win (use --retune)", file=sys.stderr)
+
+    return write_manifest(manifest, entries, slack)
+
+
+def read_manifest_entries(manifest):
+    """Returns the level entries of a manifest, or {} if it does not exist.
+
+    Parameters:
+        manifest (str): The manifest file.
+    """
+    if not os.path.exists(manifest):
+        return {}
+    with open(manifest, "r") as file:
+        return json.load(file)["levels"]
+
+
+def write_manifest(manifest, entries, slack):
+    """Write a manifest, with its levels sorted by name.
+
+    Parameters:
+        manifest (str): The manifest file.
+        entries (dict<str, dict>): The level entries, by level name.
+        slack (int): The slack the budgets were given.
+
+    Returns:
+        (dict): The manifest as written.
+    """
+    data = {"slack": slack, "levels": dict(sorted(entries.items()))}
+    with open(manifest, "w") as file:
+        json.dump(data, file, indent=2)
+        file.write("\n")
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute level move budgets into the level manifest.")
+    parser.add_argument("directory", nargs="?", default=".",
+                        help="directory holding the level files")
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN,
+                        help="glob for level file names")
+    parser.add_argument("--manifest",
+                        help="manifest to update (default: levels.json in "
+                             "the directory)")
+    parser.add_argument("--slack", type=int, default=DEFAULT_SLACK,
+                        help="moves allowed on top of the minimum")
+    parser.add_argument("--retune", action="store_true",
+                        help="recompute budgets of levels already listed")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    manifest = args.manifest or os.path.join(args.directory, "levels.json")
+    calibrate(find_levels(args.directory, args.pattern), manifest,
+              args.slack, args.retune, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""A full-screen curses front end that plays on single keystrokes.
+
+CursesGameApp runs the same GameApp.play loop over GameLogic, but reads
+one key per action instead of a line, and draws into a curses window.
+Every frame redraws the window around the player (see viewport) and
+curses sends only the cells that changed since the last refresh to the
+terminal, so nothing scrolls and nothing is reprinted. The moves left and
+the messages of the last action are shown in a status bar.
+
+Keys:
+    w a s d, arrows     move
+    i then a direction  investigate
+    h                   help
+    t                   hint
+    q then y            quit
+    `                   toggle the debug overlay
+
+The debug overlay shows the time from a key being read to its frame
+being on the screen: the last frame, and the mean and worst of recent
+frames.
+
+curses is part of the standard library on Unix; on Windows it needs the
+windows-curses package.
+
+Usage:
+    python curses_app.py game2.txt
+"""
+
+import argparse
+import sys
+import time
+from collections import deque
+
+try:
+    import curses
+except ImportError:
+    curses = None
+
+from a2 import GameApp, GameLogic
+from a2_support import *
+from viewport import Camera, ViewportDisplay
+
+OVERLAY_KEY = ord("`")
+INVESTIGATE_PROMPT = "Investigate which way?"
+LATENCY_WINDOW = 100
+
+# Keys that stand for a direction, besides the direction letters themselves.
+ARROW_KEYS = {}
+if curses is not None:
+    ARROW_KEYS = {curses.KEY_UP: "W", curses.KEY_DOWN: "S",
+                  curses.KEY_LEFT: "A", curses.KEY_RIGHT: "D"}
+
+
+def key_direction(key):
+    """Returns the direction a key stands for, or None.
+
+    Parameters:
+        key (int): A key code from getch().
+    """
+    if key in ARROW_KEYS:
+        return ARROW_KEYS[key]
+    if 0 <= key < 256 and chr(key).upper() in DIRECTIONS:
+        return chr(key).upper()
+    return None
+
+
+class CursesGameApp(GameApp):
+    """A GameApp that runs full screen in curses on single keystrokes."""
+
+    def __init__(self, dungeon_name="game1.txt"):
+        """Construct the app.
+
+        Parameters:
+            dungeon_name (str): The level to play.
+        """
+        self._game = GameLogic(dungeon_name)
+        self._writer = FrameWriter(NULL_SINK)
+        self._screen = None
+        self._camera = None
+        self._messages = []
+        self._status = ""
+        self._overlay = False
+        self._key_time = None
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def play(self):
+        """Plays the game full screen until it ends and a key is pressed."""
+        if curses is None:
+            raise RuntimeError("curses is not available")
+        curses.wrapper(self._run)
+
+    def _run(self, screen):
+        """Plays the game on a curses screen.
+
+        Parameters:
+            screen (curses.window): The screen set up by curses.wrapper.
+        """
+        self._screen = screen
+        try:
+            curses.curs_set(0)
+        except curses.error:
+            pass
+        screen.keypad(True)
+        super().play()
+        self._messages.append("Press any key to exit.")
+        self.draw()
+        screen.getch()
+
+    def read_action(self, prompt):
+        """Reads keys until they make up an action.
+
+        Parameters:
+            prompt (str): ACTION_PROMPT or QUIT_PROMPT.
+
+        Returns:
+            (str): The action, as GameLogic.step takes it.
+        """
+        if prompt == QUIT_PROMPT:
+            self._prompt(QUIT_PROMPT)
+            key = self._read_key()
+            return CONFIRM_QUIT if key in (ord("y"), ord("Y")) else "n"
+
+        while True:
+            key = self._read_key()
+            direction = key_direction(key)
+            if direction is not None:
+                return direction
+            if key in (ord("h"), ord("H")):
+                return HELP
+            if key in (ord("t"), ord("T")):
+                return HINT
+            if key in (ord("q"), ord("Q")):
+                return QUIT
+            if key in (ord("i"), ord("I")):
+                self._prompt(INVESTIGATE_PROMPT)
+                direction = key_direction(self._read_key())
+                if direction is not None:
+                    return f"{INVESTIGATE} {direction}"
+                self.draw()
+            elif key == OVERLAY_KEY:
+                self._overlay = not self._overlay
+                self._render()
+            elif key == curses.KEY_RESIZE:
+                self._render()
+
+    def _read_key(self):
+        """Waits for a key and notes when it arrived."""
+        key = self._screen.getch()
+        self._key_time = time.perf_counter()
+        return key
+
+    def _prompt(self, text):
+        """Shows a prompt in the status bar.
+
+        Parameters:
+            text (str): The prompt.
+        """
+        self._messages.append(text)
+        self.draw()
+
+    def show_message(self, text):
+        """Queues a message for the status bar of the next frame.
+
+        Parameters:
+            text (str): The message to show.
+        """
+        self._messages.append(text)
+
+    def draw(self):
+        """Draws a frame with the messages queued since the last one."""
+        self._status = " ".join(self._messages)
+        self._messages = []
+        self._render()
+
+    def _render(self):
+        """Draws the window around the player, the status bar and overlay."""
+        screen = self._screen
+        lines, cols = screen.getmaxyx()
+        if self._camera is None or self._camera.get_size() != (lines - 1,
+                                                               cols):
+            self._camera = Camera(lines - 1, cols)
+
+        screen.erase()
+        player = self._game.get_player()
+        display = ViewportDisplay(self._game.get_entities(),
+                                  self._game.get_dungeon_dimensions(),
+                                  self._camera)
+        text = display.render_game(player.get_position())
+        for row, line in enumerate(text.split("\n")):
+            screen.addnstr(row, 0, line, cols)
+
+        status = f"Moves left: {player.moves_remaining()}  {self._status}"
+        screen.addnstr(lines - 1, 0, status.ljust(cols), cols - 1,
+                       curses.A_REVERSE)
+
+        if self._overlay:
+            self._draw_overlay(cols)
+        screen.noutrefresh()
+        curses.doupdate()
+
+        if self._key_time is not None:
+            self._latencies.append(time.perf_counter() - self._key_time)
+            self._key_time = None
+
+    def _draw_overlay(self, cols):
+        """Draws the latency statistics in the top right corner.
+
+        Parameters:
+            cols (int): The width of the screen.
+        """
+        if self._latencies:
+            last = self._latencies[-1] * 1000
+            mean = sum(self._latencies) / len(self._latencies) * 1000
+            worst = max(self._latencies) * 1000
+            text = f" key to frame {last:.2f} ms " \
+                   f"(mean {mean:.2f}, max {worst:.2f}) "
+        else:
+            text = " key to frame: no frames yet "
+        text = text[-cols:]
+        self._screen.addnstr(0, cols - len(text), text, len(text),
+                             curses.A_REVERSE)
+
+    def get_latencies(self):
+        """Returns the key-to-frame times of recent frames, in seconds."""
+        return list(self._latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play a level full screen in curses.")
+    parser.add_argument("level", nargs="?", default="game1.txt",
+                        help="level file")
+    args = parser.parse_args()
+    if curses is None:
+        sys.exit("curses is not available (on Windows, install "
+                 "windows-curses)")
+    CursesGameApp(args.level).play()
+
+
+if __name__ == "__main__":
+    main()
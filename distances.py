@@ -0,0 +1,87 @@
+"""Breadth-first distance fields over a dungeon grid.
+
+A distance field holds, for every cell of a grid, the number of moves
+needed to walk from that cell to the nearest of a set of target cells,
+or -1 if no target can be reached. Fields are computed for the whole grid
+in one pass over flat cell indices (row * width + col) and stored in an
+array of C ints, so a field for an N-cell grid costs 4N bytes and no
+per-cell Python objects.
+"""
+
+from array import array
+
+from a2_support import DIRECTIONS
+
+UNREACHABLE = -1
+
+
+def grid_offsets(width):
+    """Returns (direction, flat offset, row offset, col offset) per direction.
+
+    Parameters:
+        width (int): The width of the grid.
+    """
+    return tuple((direction, drow * width + dcol, drow, dcol)
+                 for direction, (drow, dcol) in DIRECTIONS.items())
+
+
+def passable_table(level):
+    """Returns a 256-entry table of which tile bytes the player can enter.
+
+    Uses the Entity the level places on each tile, so the answer is the
+    one GameLogic.collision_check gives (Entity.can_collide).
+
+    Parameters:
+        level (Level): The level to inspect.
+    """
+    table = bytearray(b"\x01" * 256)
+    for byte in range(256):
+        entity = level.get_tile_entity(chr(byte))
+        if entity is not None and not entity.can_collide():
+            table[byte] = 0
+    return table
+
+
+def distance_field(tiles, passable, width, height, seeds):
+    """Breadth-first distances over passable cells from a set of seeds.
+
+    Parameters:
+        tiles (bytes): The row-major tile bytes of the grid.
+        passable (bytearray): The result of passable_table(level).
+        width (int): The width of the grid.
+        height (int): The height of the grid.
+        seeds (dict<int, int>): Maps flat indices to their starting
+            distance. Seeds with larger distances join the search when it
+            reaches that distance.
+
+    Returns:
+        (array<int>): The distance of every cell, UNREACHABLE where no seed
+            can be reached.
+    """
+    cells = width * height
+    offsets = grid_offsets(width)
+    distance = array("i", [UNREACHABLE]) * cells
+    pending = sorted((start, index) for index, start in seeds.items())
+    position = 0
+    frontier = []
+    level = pending[0][0] if pending else 0
+    while frontier or position < len(pending):
+        while position < len(pending) and pending[position][0] == level:
+            index = pending[position][1]
+            if distance[index] == UNREACHABLE:
+                distance[index] = level
+                frontier.append(index)
+            position += 1
+        level += 1
+        next_frontier = []
+        for index in frontier:
+            col = index % width
+            for _, offset, drow, dcol in offsets:
+                target = index + offset
+                if 0 <= target < cells and 0 <= col + dcol < width \
+                        and distance[target] == UNREACHABLE \
+                        and passable[tiles[target]]:
+                    distance[target] = level
+                    next_frontier.append(target)
+        frontier = next_frontier
+    return distance
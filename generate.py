@@ -0,0 +1,245 @@
+"""Generate random solvable levels.
+
+Each level is built from a single integer seed, so the same seed and
+options always give the same level. Walls are scattered over the inside
+of a walled border and the player, key, door and MoveIncrease items are
+placed on distinct free cells. Layouts that validate.check_level rejects
+are discarded straight away; the rest are solved with calibrate's budget
+search and discarded if they cannot be won. The first layout that can be
+won is kept and given the fewest moves it needs plus a slack.
+
+Levels are generated across a pool of worker processes and written as
+genN.txt (N is the seed) together with their budgets in the directory's
+level manifest, which is merged into rather than replaced. Level files
+that already exist are never overwritten, so generating into a directory
+of hand-made gameN.txt levels leaves them alone. Recalibrate generated
+levels with `python calibrate.py levels/ --pattern 'gen*.txt'`.
+
+Usage:
+    python generate.py levels/ --count 10000 --seed 0
+"""
+
+import argparse
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from a2 import Level
+from a2_support import *
+from calibrate import (DEFAULT_SLACK, level_min_moves, read_manifest_entries,
+                       write_manifest)
+from validate import check_level
+
+# Generated levels are written as f"{LEVEL_PREFIX}{seed}.txt".
+LEVEL_PREFIX = "gen"
+
+DEFAULT_SIZE = 8
+DEFAULT_WALLS = 0.25
+DEFAULT_BONUSES = 1
+MAX_ATTEMPTS = 1000
+
+# The options every level in this process is generated with. Set once per
+# worker by _init_worker.
+_options = None
+
+
+class GeneratedLevel:
+    """A generated level and its move budget."""
+
+    __slots__ = ("_seed", "_grid", "_min_moves", "_moves")
+
+    def __init__(self, seed, grid, min_moves, moves):
+        """Construct a generated level.
+
+        Parameters:
+            seed (int): The seed the level was generated from.
+            grid (Grid): The level layout.
+            min_moves (int): The fewest moves the level can be won with.
+            moves (int): The level's move budget.
+        """
+        self._seed = seed
+        self._grid = grid
+        self._min_moves = min_moves
+        self._moves = moves
+
+    def get_seed(self):
+        """Returns the seed the level was generated from."""
+        return self._seed
+
+    def get_grid(self):
+        """Returns the level layout."""
+        return self._grid
+
+    def get_min_moves(self):
+        """Returns the fewest moves the level can be won with."""
+        return self._min_moves
+
+    def get_moves(self):
+        """Returns the level's move budget."""
+        return self._moves
+
+    def to_text(self):
+        """Returns the level in the text level file format."""
+        return "\n".join(self._grid.get_row(row)
+                         for row in range(self._grid.get_height()))
+
+
+def _layout(rng, width, height, walls, bonuses):
+    """Returns the tile bytes of one random layout.
+
+    Parameters:
+        rng (random.Random): The source of randomness.
+        width (int): The width of the level, including its border.
+        height (int): The height of the level, including its border.
+        walls (float): The chance that a free inside cell is a wall.
+        bonuses (int): The number of MoveIncrease items to place.
+    """
+    cells = bytearray(WALL, "latin-1") * (width * height)
+    inside = [row * width + col for row in range(1, height - 1)
+              for col in range(1, width - 1)]
+    for index in inside:
+        if rng.random() >= walls:
+            cells[index] = ord(SPACE)
+    tiles = PLAYER + KEY + DOOR + MOVE_INCREASE * bonuses
+    for tile, index in zip(tiles, rng.sample(inside, len(tiles))):
+        cells[index] = ord(tile)
+    return cells
+
+
+def generate_level(seed, width=DEFAULT_SIZE, height=DEFAULT_SIZE,
+                   walls=DEFAULT_WALLS, bonuses=DEFAULT_BONUSES,
+                   slack=DEFAULT_SLACK):
+    """Generate a solvable level from a seed.
+
+    Parameters:
+        seed (int): The seed. The same seed and options give the same level.
+        width (int): The width of the level, including its border.
+        height (int): The height of the level, including its border.
+        walls (float): The chance that a free inside cell is a wall.
+        bonuses (int): The number of MoveIncrease items to place.
+        slack (int): Moves allowed on top of the minimum.
+
+    Returns:
+        (GeneratedLevel): The level and its move budget.
+
+    Raises:
+        ValueError: If the level is too small to hold its tiles, or no
+            solvable layout was found in MAX_ATTEMPTS tries.
+    """
+    if (width - 2) * (height - 2) < 3 + bonuses:
+        raise ValueError(f"a {width}x{height} level cannot hold "
+                         f"{3 + bonuses} tiles")
+    rng = random.Random(seed)
+    for _ in range(MAX_ATTEMPTS):
+        grid = Grid(width, height,
+                    bytes(_layout(rng, width, height, walls, bonuses)))
+        if check_level(grid) is not None:
+            continue
+        moves = level_min_moves(Level(grid))
+        if moves is not None:
+            return GeneratedLevel(seed, grid, moves, moves + slack)
+    raise ValueError(f"no solvable level found for seed {seed}")
+
+
+def level_name(seed):
+    """Returns the file name main writes the level of a seed to.
+
+    Parameters:
+        seed (int): The seed.
+    """
+    return f"{LEVEL_PREFIX}{seed}.txt"
+
+
+def _init_worker(options):
+    """Store the generation options for this worker process.
+
+    Parameters:
+        options (dict): Keyword arguments for generate_level.
+    """
+    global _options
+    _options = options
+
+
+def _generate(seed):
+    """Generate the level for a seed with this process's options.
+
+    Parameters:
+        seed (int): The seed.
+
+    Returns:
+        (tuple<int, str, int, int>): The seed, level text, fewest moves
+            needed and move budget.
+    """
+    level = generate_level(seed, **_options)
+    return seed, level.to_text(), level.get_min_moves(), level.get_moves()
+
+
+def generate_all(seeds, options, workers=None, chunksize=256):
+    """Generate levels in parallel, yielding them in seed order.
+
+    Parameters:
+        seeds (iterable<int>): The seeds to generate levels from.
+        options (dict): Keyword arguments for generate_level.
+        workers (int): The number of worker processes (default: CPU count).
+        chunksize (int): Seeds handed to a worker at a time.
+
+    Yields:
+        (tuple<int, str, int, int>): The seed, level text, fewest moves
+            needed and move budget of each level.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(options,)) as executor:
+        yield from executor.map(_generate, seeds, chunksize=chunksize)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate random solvable levels.")
+    parser.add_argument("directory", help="directory to write levels to")
+    parser.add_argument("--count", type=int, default=100,
+                        help="number of levels to generate")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first level; later levels use the "
+                             "following seeds")
+    parser.add_argument("--width", type=int, default=DEFAULT_SIZE)
+    parser.add_argument("--height", type=int, default=DEFAULT_SIZE)
+    parser.add_argument("--walls", type=float, default=DEFAULT_WALLS,
+                        help="chance that an inside cell is a wall")
+    parser.add_argument("--bonuses", type=int, default=DEFAULT_BONUSES,
+                        help="MoveIncrease items per level")
+    parser.add_argument("--slack", type=int, default=DEFAULT_SLACK,
+                        help="moves allowed on top of the minimum")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=256,
+                        help="seeds sent to a worker at a time")
+    args = parser.parse_args()
+
+    options = {"width": args.width, "height": args.height,
+               "walls": args.walls, "bonuses": args.bonuses,
+               "slack": args.slack}
+    os.makedirs(args.directory, exist_ok=True)
+    manifest = os.path.join(args.directory, "levels.json")
+    entries = read_manifest_entries(manifest)
+    seeds = range(args.seed, args.seed + args.count)
+    existing = [level_name(seed) for seed in seeds
+                if os.path.exists(os.path.join(args.directory,
+                                               level_name(seed)))]
+    if existing:
+        parser.error(f"{len(existing)} level files already exist in "
+                     f"{args.directory}, e.g. {existing[0]}; choose other "
+                     f"seeds or another directory")
+    try:
+        for seed, text, min_moves, moves in generate_all(
+                seeds, options, args.workers, args.chunksize):
+            name = level_name(seed)
+            with open(os.path.join(args.directory, name), "x") as file:
+                file.write(text)
+            entries[name] = {"min_moves": min_moves, "moves": moves}
+    finally:
+        # Record whatever was written, even if generation stopped early.
+        write_manifest(manifest, entries, args.slack)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""A process-wide cache of parsed levels.
+
+Levels are immutable once parsed, so every game started on the same file
+can share one copy. Entries are keyed by the resolved path of the level
+and remember its modification time and size, so the first lookup after a
+level file is edited drops the stale entry and parses the file again. The
+cache evicts the least recently used levels once their combined size
+passes a byte budget.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class LevelCache:
+    """A bounded least-recently-used cache of parsed levels.
+
+    Cached values must provide get_nbytes(), an estimate of the memory
+    they hold, which is what the byte budget is measured against.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """Construct an empty cache.
+
+        Parameters:
+            max_bytes (int): The combined size of cached levels above which
+                the least recently used ones are evicted.
+        """
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, filename, loader):
+        """Returns the parsed level stored in a file, loading it on a miss.
+
+        Parameters:
+            filename (str): The level file.
+            loader (callable): Called with filename to parse the level when
+                it is not cached (or the file changed since it was cached).
+
+        Returns:
+            The cached level.
+        """
+        path = os.path.realpath(filename)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                if entry[0] == stamp:
+                    self._entries.move_to_end(path)
+                    self._hits += 1
+                    return entry[1]
+                self._drop(path)
+            self._misses += 1
+
+        level = loader(filename)
+
+        with self._lock:
+            if path in self._entries:
+                self._drop(path)
+            self._entries[path] = (stamp, level)
+            self._nbytes += level.get_nbytes()
+            self._evict()
+        return level
+
+    def _drop(self, path):
+        """Removes the level cached for a path.
+
+        Parameters:
+            path (str): The resolved path of a cached level file.
+        """
+        _, level = self._entries.pop(path)
+        self._nbytes -= level.get_nbytes()
+
+    def _evict(self):
+        """Drops least recently used levels until the byte budget is met.
+
+        The most recently added level is always kept, even when it alone is
+        larger than the budget.
+        """
+        while self._nbytes > self._max_bytes and len(self._entries) > 1:
+            _, (_, level) = self._entries.popitem(last=False)
+            self._nbytes -= level.get_nbytes()
+            self._evictions += 1
+
+    def clear(self):
+        """Removes every cached level. The counters are left untouched."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def get_stats(self):
+        """Returns the cache counters.
+
+        Returns:
+            (dict<str, int>): hits, misses, evictions, the number of cached
+                entries, their combined size in bytes and the byte budget.
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": len(self._entries),
+                "bytes": self._nbytes,
+                "max_bytes": self._max_bytes,
+            }
+
+
+LEVEL_CACHE = LevelCache()
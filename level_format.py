@@ -0,0 +1,310 @@
+"""Compiled binary level files.
+
+A compiled level holds everything GameLogic needs to start a game without
+parsing text: a fixed header, the packed tile grid (one byte per tile,
+row-major) and, for every tile type on the grid, the flat indices of the
+cells holding it.
+
+Layout (all integers little-endian):
+
+    header      see HEADER below
+    tile table  `tile_count` entries of TILE_ENTRY (tile byte, count)
+    grid        height * width tile bytes
+    positions   for each tile table entry, `count` uint32 flat indices
+                (row * width + col) in row-major order
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import repeat
+
+from a2_support import *
+
+MAGIC = b"KCL1"
+VERSION = 1
+
+# magic, version, tile_count, height, width, moves,
+# player row/col, key row/col, door row/col (-1 when absent)
+HEADER = struct.Struct("<4sHHIIiiiiiii")
+TILE_ENTRY = struct.Struct("<BxxxI")
+
+COMPILED_SUFFIX = ".kcl"
+
+
+class PositionIndex:
+    """The positions of every non-empty tile of a compiled level, grouped by
+    tile id.
+
+    Each tile's flat indices stay in the buffer they were read from and are
+    turned into a set of positions only the first time that tile is asked
+    for, so reading a level costs nothing per cell.
+    """
+
+    __slots__ = ("_width", "_indices", "_positions")
+
+    def __init__(self, width, indices, positions=None):
+        """Construct an index.
+
+        Parameters:
+            width (int): The width of the level.
+            indices (dict<str, memoryview | array<int>>): The flat indices
+                (row * width + col) of the cells holding each tile.
+            positions (dict<str, frozenset<tuple<int, int>>>): Positions
+                already known, such as those stored in the header.
+        """
+        self._width = width
+        self._indices = indices
+        self._positions = dict(positions or {})
+
+    def get(self, tile, default=None):
+        """Returns the positions of the cells holding a tile, or default if
+        the level has none.
+
+        Parameters:
+            tile (str): The one character tile id.
+        """
+        positions = self._positions.get(tile)
+        if positions is None:
+            indices = self._indices.get(tile)
+            if indices is None:
+                return default
+            positions = frozenset(map(divmod, indices, repeat(self._width)))
+            self._positions[tile] = positions
+        return positions
+
+    def __getitem__(self, tile):
+        """Returns the positions of the cells holding a tile.
+
+        Parameters:
+            tile (str): The one character tile id.
+
+        Raises:
+            KeyError: If the level has no such tile.
+        """
+        positions = self.get(tile)
+        if positions is None:
+            raise KeyError(tile)
+        return positions
+
+    def __contains__(self, tile):
+        """Returns True if the level has a tile."""
+        return tile in self._indices
+
+    def __iter__(self):
+        """Iterates over the tile ids of the level."""
+        return iter(self._indices)
+
+    def __len__(self):
+        """Returns the number of tile ids on the level."""
+        return len(self._indices)
+
+    def count(self, tile):
+        """Returns the number of cells holding a tile, without decoding
+        them.
+
+        Parameters:
+            tile (str): The one character tile id.
+        """
+        indices = self._indices.get(tile)
+        return 0 if indices is None else len(indices)
+
+
+class CompiledLevel:
+    """A level read from a compiled level file.
+
+    The grid and the position index are read-only and may be views of the
+    buffer the level was read from.
+    """
+
+    __slots__ = ("_grid", "_positions", "_moves")
+
+    def __init__(self, grid, positions, moves):
+        """Construct a compiled level.
+
+        Parameters:
+            grid (Grid): The tile grid of the level.
+            positions (PositionIndex): The positions of every non-empty
+                tile, grouped by tile id.
+            moves (int): The move budget of the level.
+        """
+        self._grid = grid
+        self._positions = positions
+        self._moves = moves
+
+    def get_grid(self):
+        """Returns the tile grid of the level."""
+        return self._grid
+
+    def get_positions(self):
+        """Returns the positions of every non-empty tile, grouped by id."""
+        return self._positions
+
+    def get_moves(self):
+        """Returns the move budget of the level."""
+        return self._moves
+
+
+def _first(positions):
+    """Returns the first position of a list, or (-1, -1) if it is empty."""
+    return positions[0] if positions else (-1, -1)
+
+
+def encode_level(grid, moves):
+    """Pack a level into the compiled level format.
+
+    Parameters:
+        grid (Grid): The tile grid of the level.
+        moves (int): The move budget to store with the level.
+
+    Returns:
+        (bytes): The compiled level.
+    """
+    width = grid.get_width()
+    tiles = sorted(tile for tile in grid.get_tiles() if tile != SPACE)
+    found = {tile: grid.find_all(tile) for tile in tiles}
+
+    parts = [HEADER.pack(
+        MAGIC, VERSION, len(tiles), grid.get_height(), width, moves,
+        *_first(found.get(PLAYER)),
+        *_first(found.get(KEY)),
+        *_first(found.get(DOOR)),
+    )]
+    for tile in tiles:
+        parts.append(TILE_ENTRY.pack(ord(tile), len(found[tile])))
+    parts.append(grid.to_bytes())
+    for tile in tiles:
+        indices = array("I", (row * width + col for row, col in found[tile]))
+        if sys.byteorder != "little":
+            indices.byteswap()
+        parts.append(indices.tobytes())
+    return b"".join(parts)
+
+
+def compile_level(source, target, moves):
+    """Compile a text level file into a binary level file.
+
+    Parameters:
+        source (str): The text level file, in the gameN.txt format.
+        target (str): The path of the compiled file to write.
+        moves (int): The move budget to store with the level.
+    """
+    data = encode_level(load_grid(source), moves)
+    with open(target, "wb") as file:
+        file.write(data)
+
+
+def decode_level(data):
+    """Read a level in the compiled level format from a buffer.
+
+    Nothing is copied out of a memoryview: the grid and the position
+    indices are views of it, so a level decoded from shared memory or a
+    memory map keeps its tiles there and the buffer must stay open while
+    the level is in use. Other buffers, such as bytes, are sliced.
+
+    Parameters:
+        data (memoryview | bytes): The compiled level.
+
+    Returns:
+        (CompiledLevel): The level stored in the buffer.
+
+    Raises:
+        ValueError: If the buffer does not hold a compiled level.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("not a compiled level")
+    (magic, version, tile_count, height, width, moves,
+     *first) = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a compiled level")
+
+    offset = HEADER.size
+    if len(data) < offset + tile_count * TILE_ENTRY.size:
+        raise ValueError("compiled level is truncated")
+    counts = []
+    for _ in range(tile_count):
+        tile, count = TILE_ENTRY.unpack_from(data, offset)
+        counts.append((chr(tile), count))
+        offset += TILE_ENTRY.size
+
+    size = height * width
+    end = offset + size + 4 * sum(count for _, count in counts)
+    if len(data) < end:
+        raise ValueError("compiled level is truncated")
+    grid = Grid(width, height, data[offset:offset + size])
+    offset += size
+
+    indices = {}
+    for tile, count in counts:
+        chunk = data[offset:offset + 4 * count]
+        if isinstance(chunk, memoryview) and sys.byteorder == "little":
+            indices[tile] = chunk.cast("I")
+        else:
+            indices[tile] = array("I", chunk)
+            if sys.byteorder != "little":
+                indices[tile].byteswap()
+        offset += 4 * count
+
+    # The header names the first player, key and door, which is all of
+    # them on a playable level, so starting a game decodes no indices.
+    known = {}
+    for tile, (row, col) in zip((PLAYER, KEY, DOOR),
+                                zip(first[::2], first[1::2])):
+        if row >= 0 and len(indices.get(tile, ())) == 1:
+            known[tile] = frozenset({(row, col)})
+
+    return CompiledLevel(grid, PositionIndex(width, indices, known), moves)
+
+
+def load_compiled(filename):
+    """Load a compiled level file through a read-only memory map.
+
+    The level's grid and position indices are views of the map, so tiles
+    are read from the file only as they are used. The map is closed when
+    the level is no longer referenced.
+
+    Parameters:
+        filename (str): The compiled level file.
+
+    Returns:
+        (CompiledLevel): The level stored in the file.
+    """
+    with open(filename, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(data)
+    try:
+        return decode_level(view)
+    except ValueError:
+        view.release()
+        data.close()
+        raise ValueError(
+            f"{filename} is not a compiled level file") from None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compile text level files into binary level files.")
+    parser.add_argument("levels", nargs="+", help="text level files")
+    parser.add_argument("--moves", type=int,
+                        help="move budget (default: from the level's "
+                             "manifest)")
+    parser.add_argument("--output-dir",
+                        help="where to write the compiled files "
+                             "(default: next to each level)")
+    args = parser.parse_args()
+
+    for level in args.levels:
+        moves = args.moves
+        if moves is None:
+            moves = level_moves(level)
+        stem = os.path.splitext(level)[0]
+        if args.output_dir is not None:
+            stem = os.path.join(args.output_dir, os.path.basename(stem))
+        compile_level(level, stem + COMPILED_SUFFIX, moves)
+
+
+if __name__ == "__main__":
+    main()
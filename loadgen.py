@@ -0,0 +1,131 @@
+"""Drive simulated players against a game server and measure it.
+
+Each simulated player connects, waits for a prompt, answers with a random
+move and repeats; when its game ends it connects again. After the run the
+generator reports the lines sent per second and the 50th, 99th and worst
+round-trip time from sending a line to receiving the next prompt, as seen
+by the clients.
+
+Usage:
+    python loadgen.py --port 4000 --players 500 --duration 10
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from a2_support import *
+from async_app import ENCODING
+from server import DEFAULT_HOST, DEFAULT_PORT, percentile
+
+PROMPTS = (ACTION_PROMPT.encode(ENCODING), QUIT_PROMPT.encode(ENCODING))
+MOVES = tuple(DIRECTIONS)
+
+
+async def read_prompt(reader):
+    """Reads a server's output up to its next prompt.
+
+    Parameters:
+        reader (asyncio.StreamReader): The connection's input.
+
+    Returns:
+        (bool): True if a prompt arrived, False if the server closed.
+    """
+    data = b""
+    while not data.endswith(PROMPTS):
+        chunk = await reader.read(65536)
+        if not chunk:
+            return False
+        data += chunk
+    return True
+
+
+async def simulate_player(host, port, deadline, rng, latencies, think):
+    """Plays games until the deadline passes.
+
+    Parameters:
+        host (str): The server's address.
+        port (int): The server's game port.
+        deadline (float): When to stop, on the time.perf_counter clock.
+        rng (random.Random): Chooses the moves.
+        latencies (list<float>): Where round-trip times are appended.
+        think (float): Seconds to wait before each move.
+
+    Returns:
+        (int): The number of games started.
+    """
+    games = 0
+    while time.perf_counter() < deadline:
+        reader, writer = await asyncio.open_connection(host, port)
+        games += 1
+        try:
+            prompted = await read_prompt(reader)
+            while prompted and time.perf_counter() < deadline:
+                if think:
+                    await asyncio.sleep(think)
+                sent = time.perf_counter()
+                writer.write((rng.choice(MOVES) + "\n").encode(ENCODING))
+                prompted = await read_prompt(reader)
+                if prompted:
+                    latencies.append(time.perf_counter() - sent)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+    return games
+
+
+async def run(host, port, players, duration, seed, think):
+    """Runs simulated players for a while and returns their measurements.
+
+    Parameters:
+        host (str): The server's address.
+        port (int): The server's game port.
+        players (int): The number of players.
+        duration (float): Seconds to run for.
+        seed (int): Seeds the players' moves.
+        think (float): Seconds each player waits before each move.
+
+    Returns:
+        (tuple<list<float>, int, float>): The round-trip times, the games
+            played and the seconds the run took.
+    """
+    latencies = []
+    start = time.perf_counter()
+    deadline = start + duration
+    games = await asyncio.gather(*(
+        simulate_player(host, port, deadline, random.Random(seed + player),
+                        latencies, think)
+        for player in range(players)))
+    return latencies, sum(games), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Drive simulated players against a game server.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10,
+                        help="seconds to run for")
+    parser.add_argument("--think", type=float, default=0,
+                        help="seconds each player waits before each move")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    latencies, games, elapsed = asyncio.run(run(
+        args.host, args.port, args.players, args.duration, args.seed,
+        args.think))
+    ordered = sorted(latencies)
+    print(f"{args.players} players, {games} games, {len(ordered)} lines in "
+          f"{elapsed:.1f} s: {len(ordered) / elapsed:.0f} lines/s, "
+          f"p50 {percentile(ordered, 0.50) * 1000:.2f} ms, "
+          f"p99 {percentile(ordered, 0.99) * 1000:.2f} ms, "
+          f"max {(ordered[-1] if ordered else 0) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""Host many games over TCP, one session per connection.
+
+Each connection plays one game through AsyncGameApp, so the line protocol
+is exactly what GameApp.play prints and reads: the server sends the
+dungeon, the moves left and a prompt, and the client answers with one
+line. The level is parsed once and every session plays a fork of the same
+template game, so sessions share the level's grid, entities and caches
+and hold only what they have changed. A session that sends nothing for
+--idle-timeout seconds is told so and disconnected.
+
+The server keeps live statistics: sessions open and served, lines handled
+per second, and the 50th and 99th percentile time from receiving a line
+to having sent the turn it produced. They are logged to stderr every
+--stats-interval seconds and, if --stats-port is given, sent as one JSON
+object to anything that connects to that port:
+
+    {"sessions": 812, "served": 5120, "timeouts": 3, "actions": 401233,
+     "actions_per_sec": 20512.0, "p50_ms": 0.05, "p99_ms": 0.4}
+
+With --max-hot, at most that many games are kept in memory and the least
+recently used are spilled to --spill-dir (see session_store) until their
+player's next line. The statistics then also hold the store's counts and
+the 50th and 99th percentile time to spill and to restore a game:
+
+    {..., "hot": 1000, "spilled": 11200, "evictions": 40210,
+     "restores": 29010, "bytes_spilled": 1206300, "evict_p50_ms": 0.02,
+     "evict_p99_ms": 0.09, "restore_p50_ms": 0.04, "restore_p99_ms": 0.12}
+
+Usage:
+    python server.py game2.txt --port 4000 --stats-port 4001
+    python loadgen.py --port 4000 --players 500 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from collections import deque
+from itertools import count
+
+from a2 import GameLogic
+from a2_support import *
+from async_app import ENCODING, AsyncGameApp
+from session_store import SessionStore
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 4000
+DEFAULT_IDLE_TIMEOUT = 300
+IDLE_TEXT = "You have been idle for too long. Goodbye."
+
+# How many recent latencies the percentiles are taken over.
+LATENCY_SAMPLES = 10000
+
+
+def percentile(ordered, fraction):
+    """Returns the value at a fraction of the way through a sorted list.
+
+    Parameters:
+        ordered (list<float>): The values, sorted.
+        fraction (float): Between 0 and 1.
+    """
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ServerStats:
+    """Live counts and latencies for a game server."""
+
+    def __init__(self, store=None):
+        """Construct statistics for a server that has served nobody.
+
+        Parameters:
+            store (SessionStore): The server's session store, if it has one.
+        """
+        self._store = store
+        self._sessions = 0
+        self._served = 0
+        self._timeouts = 0
+        self._actions = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._last_actions = 0
+        self._last_time = time.perf_counter()
+        self._rate = 0.0
+
+    def session_opened(self):
+        """Counts a new session."""
+        self._sessions += 1
+        self._served += 1
+
+    def session_closed(self, timed_out=False):
+        """Counts a session ending.
+
+        Parameters:
+            timed_out (bool): Whether it ended by idling too long.
+        """
+        self._sessions -= 1
+        self._timeouts += timed_out
+
+    def record_action(self, latency):
+        """Counts a handled line.
+
+        Parameters:
+            latency (float): Seconds from receiving it to sending its turn.
+        """
+        self._actions += 1
+        self._latencies.append(latency)
+
+    def tick(self):
+        """Updates the lines per second since the previous tick."""
+        now = time.perf_counter()
+        self._rate = (self._actions - self._last_actions) / \
+            max(now - self._last_time, 1e-9)
+        self._last_actions = self._actions
+        self._last_time = now
+
+    def get_stats(self):
+        """Returns the current statistics as a dictionary."""
+        ordered = sorted(self._latencies)
+        stats = {
+            "sessions": self._sessions,
+            "served": self._served,
+            "timeouts": self._timeouts,
+            "actions": self._actions,
+            "actions_per_sec": round(self._rate, 1),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        }
+        if self._store is not None:
+            stats.update(self._store.get_stats())
+            for name, latencies in (
+                    ("evict", self._store.get_eviction_latencies()),
+                    ("restore", self._store.get_restore_latencies())):
+                ordered = sorted(latencies)
+                stats[f"{name}_p50_ms"] = round(
+                    percentile(ordered, 0.50) * 1000, 3)
+                stats[f"{name}_p99_ms"] = round(
+                    percentile(ordered, 0.99) * 1000, 3)
+        return stats
+
+
+class SessionApp(AsyncGameApp):
+    """An AsyncGameApp that reports each line's latency to ServerStats."""
+
+    def __init__(self, game, reader, writer, idle_timeout, stats):
+        """Construct a session.
+
+        Parameters:
+            game (GameLogic): The game to play.
+            reader (asyncio.StreamReader): The connection's input.
+            writer (asyncio.StreamWriter): The connection's output.
+            idle_timeout (float): Seconds to wait for each line.
+            stats (ServerStats): Where latencies are recorded.
+        """
+        super().__init__(game, reader, writer, idle_timeout)
+        self._stats = stats
+        self._received = None
+
+    async def read_action(self, prompt):
+        """Reads a line, noting when it arrived.
+
+        Parameters:
+            prompt (str): The prompt to show.
+        """
+        line = await super().read_action(prompt)
+        self._received = time.perf_counter()
+        return line
+
+    def flush(self):
+        """Writes this turn's output and records the latency of its line."""
+        super().flush()
+        if self._received is not None:
+            self._stats.record_action(time.perf_counter() - self._received)
+            self._received = None
+
+
+class StoredSessionApp(SessionApp):
+    """A SessionApp whose game lives in a SessionStore between lines."""
+
+    def __init__(self, key, store, reader, writer, idle_timeout, stats):
+        """Construct a session on a game already added to a store.
+
+        Parameters:
+            key (str): The session's key in the store.
+            store (SessionStore): The store holding the game.
+            reader (asyncio.StreamReader): The connection's input.
+            writer (asyncio.StreamWriter): The connection's output.
+            idle_timeout (float): Seconds to wait for each line.
+            stats (ServerStats): Where latencies are recorded.
+        """
+        super().__init__(None, reader, writer, idle_timeout, stats)
+        self._key = key
+        self._store = store
+
+    def get_game(self):
+        """Returns the game, read back from disk if it was spilled."""
+        return self._store.get(self._key)
+
+
+class GameServer:
+    """Accepts connections and plays a game on each."""
+
+    def __init__(self, level, idle_timeout=DEFAULT_IDLE_TIMEOUT, store=None):
+        """Construct a server for a level.
+
+        Parameters:
+            level (str): The level file every session plays.
+            idle_timeout (float): Seconds a session may wait between lines.
+            store (SessionStore): Where games are kept between lines, or
+                None to keep each in its session. The store looks the level
+                up by its file name.
+        """
+        self._start(GameLogic(level), idle_timeout, store, level)
+
+    @classmethod
+    def from_game(cls, template, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        """Construct a server whose sessions play forks of a given game.
+
+        Parameters:
+            template (GameLogic): The game every session starts from.
+            idle_timeout (float): Seconds a session may wait between lines.
+        """
+        server = cls.__new__(cls)
+        server._start(template, idle_timeout)
+        return server
+
+    def _start(self, template, idle_timeout, store=None, level_id=None):
+        """Sets up a server that has served nobody.
+
+        Parameters:
+            template (GameLogic): The game every session starts from.
+            idle_timeout (float): Seconds a session may wait between lines.
+            store (SessionStore): Where games are kept between lines, or
+                None.
+            level_id (str): The id the store looks the template's level up
+                by.
+        """
+        self._template = template
+        self._idle_timeout = idle_timeout
+        self._store = store
+        self._level_id = level_id
+        self._keys = count()
+        self._stats = ServerStats(store)
+
+    def get_stats(self):
+        """Returns the server's ServerStats."""
+        return self._stats
+
+    async def handle(self, reader, writer):
+        """Plays one session on a connection, then closes it.
+
+        Parameters:
+            reader (asyncio.StreamReader): The connection's input.
+            writer (asyncio.StreamWriter): The connection's output.
+        """
+        stats = self._stats
+        stats.session_opened()
+        timed_out = False
+        store = self._store
+        if store is None:
+            app = SessionApp(self._template.fork(), reader, writer,
+                             self._idle_timeout, stats)
+        else:
+            key = str(next(self._keys))
+            store.add(key, self._template.fork(), self._level_id)
+            app = StoredSessionApp(key, store, reader, writer,
+                                   self._idle_timeout, stats)
+        try:
+            await app.play()
+        except asyncio.TimeoutError:
+            timed_out = True
+            writer.write(("\n" + IDLE_TEXT + "\n").encode(ENCODING))
+        except (EOFError, ConnectionError):
+            pass
+        finally:
+            stats.session_closed(timed_out)
+            if store is not None:
+                store.remove(key)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def handle_stats(self, reader, writer):
+        """Sends the current statistics as one JSON line and closes.
+
+        Parameters:
+            reader (asyncio.StreamReader): The connection's input.
+            writer (asyncio.StreamWriter): The connection's output.
+        """
+        writer.write((json.dumps(self._stats.get_stats()) + "\n")
+                     .encode(ENCODING))
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def report(self, interval):
+        """Updates the rate every second and logs statistics periodically.
+
+        Parameters:
+            interval (float): Seconds between log lines, or 0 for none.
+        """
+        elapsed = 0
+        while True:
+            await asyncio.sleep(1)
+            self._stats.tick()
+            elapsed += 1
+            if interval and elapsed >= interval:
+                elapsed = 0
+                print(json.dumps(self._stats.get_stats()), file=sys.stderr,
+                      flush=True)
+
+    async def serve(self, host, port, stats_port=None, stats_interval=10):
+        """Serves until cancelled.
+
+        Parameters:
+            host (str): The address to listen on.
+            port (int): The game port.
+            stats_port (int): The statistics port, or None for none.
+            stats_interval (float): Seconds between stderr statistics, or 0.
+        """
+        servers = [await asyncio.start_server(self.handle, host, port)]
+        if stats_port is not None:
+            servers.append(await asyncio.start_server(self.handle_stats,
+                                                      host, stats_port))
+        reporter = asyncio.create_task(self.report(stats_interval))
+        try:
+            await asyncio.gather(*(server.serve_forever()
+                                   for server in servers))
+        finally:
+            reporter.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve games over TCP, one per connection.")
+    parser.add_argument("level", nargs="?", default="game1.txt",
+                        help="level file every session plays")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--stats-port", type=int,
+                        help="port that answers with the statistics")
+    parser.add_argument("--stats-interval", type=float, default=10,
+                        help="seconds between statistics on stderr (0: "
+                             "never)")
+    parser.add_argument("--idle-timeout", type=float,
+                        default=DEFAULT_IDLE_TIMEOUT,
+                        help="seconds a session may wait between lines")
+    parser.add_argument("--max-hot", type=int,
+                        help="games kept in memory; the least recently used "
+                             "are spilled to disk (default: keep all)")
+    parser.add_argument("--spill-dir",
+                        help="where spilled games go (default: a temporary "
+                             "directory)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="sessions-") as scratch:
+        store = None
+        if args.max_hot is not None:
+            store = SessionStore(args.spill_dir or scratch, args.max_hot)
+        server = GameServer(args.level, args.idle_timeout, store)
+        try:
+            asyncio.run(server.serve(args.host, args.port, args.stats_port,
+                                     args.stats_interval))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Keep a bounded number of games in memory and spill idle ones to disk.
+
+A server with thousands of open but mostly idle sessions would otherwise
+keep every session's GameLogic resident, and a game that has asked for a
+hint after collecting an item holds its own distance fields.
+SessionStore keeps at most `capacity` games in memory in least recently
+used order. Adding or fetching a game beyond that writes the least
+recently used one to a small file and drops it; fetching a spilled game
+reads it back, so callers never see the difference.
+
+A spilled session is one record (all integers little-endian):
+
+    header      see RECORD below
+    level id    `level_length` bytes of UTF-8
+    inventory   one tile byte per item held
+    collected   `collected_count` uint32 flat indices (row * width + col)
+                of the items taken off the level
+
+Only the mutable state of a game is stored (see GameLogic.snapshot); the
+level is looked up by its id when the game is restored.
+"""
+
+import os
+import struct
+import sys
+import time
+from array import array
+from collections import OrderedDict, deque
+
+from a2 import GameLogic, GameSnapshot, load_level
+from a2_support import *
+
+VERSION = 1
+
+# version, flags, player row/col, moves left, level id length,
+# items held, items collected
+RECORD = struct.Struct("<BBiiiHHI")
+WON = 1
+CONFIRMING_QUIT = 2
+
+SESSION_SUFFIX = ".ses"
+DEFAULT_CAPACITY = 10000
+
+# How many recent evictions and restores the latencies are kept for.
+LATENCY_WINDOW = 10000
+
+
+def encode_session(game, level_id):
+    """Packs the mutable state of a game into a session record.
+
+    Parameters:
+        game (GameLogic): The game.
+        level_id (str): The id its level is looked up by when restored.
+
+    Returns:
+        (bytes): The record.
+    """
+    snapshot = game.snapshot()
+    width = game.get_dungeon_size()
+    flags = (WON if snapshot.won() else 0) | \
+        (CONFIRMING_QUIT if game.is_confirming_quit() else 0)
+    level = level_id.encode("utf-8")
+    inventory = "".join(item.get_id()
+                        for item in snapshot.get_inventory()).encode("latin-1")
+    collected = array("I", (row * width + col
+                            for row, col in snapshot.get_collected()))
+    if sys.byteorder != "little":
+        collected.byteswap()
+    return b"".join((
+        RECORD.pack(VERSION, flags, *snapshot.get_position(),
+                    snapshot.get_moves(), len(level), len(inventory),
+                    len(collected)),
+        level, inventory, collected.tobytes()))
+
+
+def decode_session(data, levels=load_level):
+    """Rebuilds a game from a session record.
+
+    Parameters:
+        data (bytes): The record.
+        levels (callable): Returns the Level for a level id.
+
+    Returns:
+        (tuple<str, GameLogic>): The level id and the restored game.
+
+    Raises:
+        ValueError: If the data is not a session record.
+    """
+    (version, flags, row, col, moves, level_length, held,
+     count) = RECORD.unpack_from(data, 0)
+    if version != VERSION:
+        raise ValueError("not a session record")
+    offset = RECORD.size
+    level_id = bytes(data[offset:offset + level_length]).decode("utf-8")
+    offset += level_length
+    inventory = bytes(data[offset:offset + held]).decode("latin-1")
+    offset += held
+    collected = array("I")
+    collected.frombytes(data[offset:offset + count * collected.itemsize])
+    if sys.byteorder != "little":
+        collected.byteswap()
+
+    level = levels(level_id)
+    grid = level.get_grid()
+    collected = frozenset(divmod(index, grid.get_width())
+                          for index in collected)
+    # Each held item is the one from a collected cell of its tile; the
+    # record does not say which, so they are handed out in row-major order.
+    cells = {}
+    for position in sorted(collected):
+        cells.setdefault(grid.get_tile(position), []).append(position)
+    items = tuple(level.get_entity(cells[tile].pop(0)) for tile in inventory)
+    game = GameLogic.from_snapshot(GameSnapshot(
+        level, (row, col), moves, items, collected, bool(flags & WON)))
+    if flags & CONFIRMING_QUIT:
+        # Asking to quit changes nothing but the prompt, so playing it
+        # again puts the game back where the player left it.
+        game.step(QUIT)
+    return level_id, game
+
+
+class SessionStore:
+    """Games by session key, the least recently used spilled to disk."""
+
+    def __init__(self, directory, capacity=DEFAULT_CAPACITY,
+                 levels=load_level):
+        """Construct an empty store.
+
+        Parameters:
+            directory (str): Where spilled sessions are written. It must
+                exist.
+            capacity (int): The most games kept in memory, at least 1.
+            levels (callable): Returns the Level for a level id.
+        """
+        if capacity < 1:
+            raise ValueError("a session store must hold at least one game")
+        self._directory = directory
+        self._capacity = capacity
+        self._levels = levels
+        self._hot = OrderedDict()
+        self._spilled = set()
+        self._evictions = 0
+        self._restores = 0
+        self._bytes_spilled = 0
+        self._eviction_latencies = deque(maxlen=LATENCY_WINDOW)
+        self._restore_latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def _path(self, key):
+        """Returns the file a session is spilled to.
+
+        Parameters:
+            key (str): The session key, safe to use in a file name.
+        """
+        return os.path.join(self._directory, f"{key}{SESSION_SUFFIX}")
+
+    def add(self, key, game, level_id):
+        """Stores a new session as the most recently used.
+
+        Parameters:
+            key (str): The session key, safe to use in a file name.
+            game (GameLogic): The session's game.
+            level_id (str): The id the game's level is looked up by.
+        """
+        self.remove(key)
+        self._hot[key] = (game, level_id)
+        self._trim()
+
+    def get(self, key):
+        """Returns a session's game, reading it back if it was spilled, and
+        marks it the most recently used.
+
+        The game returned for a spilled session is a new object equal to
+        the one stored, so callers should fetch the game again after
+        anything that may let other sessions run instead of keeping it.
+
+        Parameters:
+            key (str): The session key.
+
+        Raises:
+            KeyError: If the store holds no such session.
+        """
+        entry = self._hot.get(key)
+        if entry is None:
+            if key not in self._spilled:
+                raise KeyError(key)
+            entry = self._restore(key)
+            self._hot[key] = entry
+            self._trim()
+        else:
+            self._hot.move_to_end(key)
+        return entry[0]
+
+    def remove(self, key):
+        """Forgets a session, in memory or on disk, if the store holds it.
+
+        Parameters:
+            key (str): The session key.
+        """
+        self._hot.pop(key, None)
+        if key in self._spilled:
+            self._spilled.discard(key)
+            os.remove(self._path(key))
+
+    def __contains__(self, key):
+        """Returns True if the store holds a session, in memory or not.
+
+        Parameters:
+            key (str): The session key.
+        """
+        return key in self._hot or key in self._spilled
+
+    def __len__(self):
+        """Returns the number of sessions held, in memory or not."""
+        return len(self._hot) + len(self._spilled)
+
+    def _trim(self):
+        """Spills the least recently used games until within capacity."""
+        while len(self._hot) > self._capacity:
+            key, (game, level_id) = self._hot.popitem(last=False)
+            start = time.perf_counter()
+            data = encode_session(game, level_id)
+            with open(self._path(key), "wb") as file:
+                file.write(data)
+            self._spilled.add(key)
+            self._evictions += 1
+            self._bytes_spilled += len(data)
+            self._eviction_latencies.append(time.perf_counter() - start)
+
+    def _restore(self, key):
+        """Reads a spilled game back and deletes its file.
+
+        Parameters:
+            key (str): The session key.
+
+        Returns:
+            (tuple<GameLogic, str>): The game and its level id.
+        """
+        start = time.perf_counter()
+        path = self._path(key)
+        with open(path, "rb") as file:
+            level_id, game = decode_session(file.read(), self._levels)
+        os.remove(path)
+        self._spilled.discard(key)
+        self._restores += 1
+        self._restore_latencies.append(time.perf_counter() - start)
+        return game, level_id
+
+    def get_eviction_latencies(self):
+        """Returns the seconds recent evictions took, oldest first."""
+        return list(self._eviction_latencies)
+
+    def get_restore_latencies(self):
+        """Returns the seconds recent restores took, oldest first."""
+        return list(self._restore_latencies)
+
+    def get_stats(self):
+        """Returns the store's counts as a dictionary."""
+        return {
+            "hot": len(self._hot),
+            "spilled": len(self._spilled),
+            "evictions": self._evictions,
+            "restores": self._restores,
+            "bytes_spilled": self._bytes_spilled,
+        }
@@ -0,0 +1,494 @@
+"""Serve games from several worker processes, one CPU core each.
+
+server.py plays every session on one event loop, so it uses one core. Here
+a front-end process accepts the connections and hands each one to one of
+--workers worker processes, each running server.py's GameServer on its own
+event loop.
+
+A connection's worker is chosen by consistent hashing of its session key
+(the client's address and port) onto a ring of virtual nodes: the same key
+always lands on the same worker, and adding or removing a worker moves
+only the keys of the ring segments it gains or loses, about 1/N of them.
+The front end passes the accepted socket itself to the worker over a Unix
+socket pair, so the session then talks to its worker directly and stays on
+it until it ends; the front end never touches its traffic.
+
+The level is compiled once (see level_format) into a block of
+multiprocessing.shared_memory, and every worker decodes it in place: the
+tile grid and the position indices are read-only views of the shared
+block, not copies, and each cell's Entity is looked up from its tile
+byte. The rows a frame is drawn from are read from the shared grid as
+each frame is drawn (see GridRows), so no worker keeps a copy of the map
+between frames. A worker builds Python objects for the level only when
+they are asked for: position sets for the tiles it looks up and, once a
+player asks for a hint, that hint's distance field, which is the size of
+the map.
+
+The front end never blocks on a worker: its channel ends are
+non-blocking, and a connection that cannot be passed straight away waits
+in a per-worker queue until the channel can be written again.
+
+Workers send their statistics (see server.py) to the front end every
+second. The front end logs the totals to stderr every --stats-interval
+seconds and sends them, with each worker's own, as one JSON object to
+anything that connects to --stats-port. The percentiles in the totals are
+the worst of the workers'.
+
+Passing sockets between processes needs Unix.
+
+Usage:
+    python shard_server.py game2.txt --port 4000 --workers 4
+    python bench_shards.py game2.txt --max-workers 4
+"""
+
+import argparse
+import asyncio
+import bisect
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+from collections import deque
+from multiprocessing import shared_memory
+
+from a2 import GameLogic, Level
+from a2_support import *
+from async_app import ENCODING
+from level_format import COMPILED_SUFFIX, decode_level, encode_level
+from server import (DEFAULT_HOST, DEFAULT_IDLE_TIMEOUT, DEFAULT_PORT,
+                    GameServer, ServerStats)
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Points each worker has on the hash ring. More points spread the keys
+# more evenly between workers.
+RING_REPLICAS = 64
+
+# Sockets handed to a worker in one message, at most.
+MAX_HANDOFF = 64
+HANDOFF = b"S"
+
+# The shared memory block a worker's level lives in, kept by run_worker for
+# the life of the worker: the level's grid is a view of it.
+_memory = None
+
+# Totals that are summed over the workers; the rest take the worst.
+SUMMED = ("sessions", "served", "timeouts", "actions", "actions_per_sec")
+
+
+def hash_key(key):
+    """Returns a stable 64-bit hash of a string.
+
+    Unlike hash(), the value is the same in every process and every run.
+
+    Parameters:
+        key (str): The string to hash.
+    """
+    digest = hashlib.blake2b(key.encode(ENCODING), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class HashRing:
+    """Maps keys to nodes by consistent hashing."""
+
+    def __init__(self, nodes, replicas=RING_REPLICAS):
+        """Construct a ring holding the given nodes.
+
+        Parameters:
+            nodes (list<int>): The nodes to map keys to.
+            replicas (int): The number of points each node has on the ring.
+        """
+        points = sorted((hash_key(f"{node}#{replica}"), node)
+                        for node in nodes for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def get_node(self, key):
+        """Returns the node a key maps to: the owner of the first point on
+        the ring at or after the key's hash.
+
+        Parameters:
+            key (str): The key to look up.
+        """
+        index = bisect.bisect_left(self._hashes, hash_key(key))
+        return self._nodes[index % len(self._nodes)]
+
+
+def share_level(level):
+    """Compiles a level into a new block of shared memory.
+
+    The caller owns the block and must close and unlink it.
+
+    Parameters:
+        level (str): A text level file listed in a manifest (see
+            level_moves), or a compiled level file.
+
+    Returns:
+        (multiprocessing.shared_memory.SharedMemory): The block.
+    """
+    if level.endswith(COMPILED_SUFFIX):
+        with open(level, "rb") as file:
+            data = file.read()
+    else:
+        data = encode_level(load_grid(level), level_moves(level))
+    memory = shared_memory.SharedMemory(create=True, size=len(data))
+    memory.buf[:len(data)] = data
+    return memory
+
+
+def attach_level(name):
+    """Starts a game on a level shared by share_level, without copying its
+    grid.
+
+    Parameters:
+        name (str): The name of the shared memory block.
+
+    Returns:
+        (tuple<SharedMemory, GameLogic>): The attached block, which must be
+            kept open while the game or any fork of it is in use, and a new
+            game on the level.
+    """
+    memory = shared_memory.SharedMemory(name)
+    compiled = decode_level(memory.buf.toreadonly())
+    level = Level(compiled.get_grid(), compiled.get_positions(),
+                  compiled.get_moves())
+    return memory, GameLogic.from_level(level, level.get_moves())
+
+
+def combine_stats(workers):
+    """Returns the totals of several servers' statistics.
+
+    Parameters:
+        workers (list<dict>): Each server's ServerStats.get_stats().
+    """
+    totals = {"workers": len(workers)}
+    for name in SUMMED:
+        totals[name] = sum(stats.get(name, 0) for stats in workers)
+    totals["actions_per_sec"] = round(totals["actions_per_sec"], 1)
+    for name in ("p50_ms", "p99_ms"):
+        totals[name] = max((stats.get(name, 0) for stats in workers),
+                           default=0)
+    return totals
+
+
+async def serve_connection(server, sock):
+    """Plays one session on a socket handed over by the front end.
+
+    Parameters:
+        server (GameServer): The worker's server.
+        sock (socket.socket): The client's connection.
+    """
+    try:
+        reader, writer = await asyncio.open_connection(sock=sock)
+    except OSError:
+        sock.close()
+        return
+    await server.handle(reader, writer)
+
+
+async def run_worker_loop(server, channel):
+    """Plays the sessions handed over on a channel until the front end goes.
+
+    Parameters:
+        server (GameServer): The worker's server.
+        channel (socket.socket): The worker's end of its socket pair.
+    """
+    loop = asyncio.get_running_loop()
+    closed = loop.create_future()
+    sessions = set()
+
+    def receive():
+        try:
+            message, fds, _, _ = socket.recv_fds(channel, MAX_HANDOFF,
+                                                 MAX_HANDOFF)
+        except BlockingIOError:
+            return
+        for fd in fds:
+            task = loop.create_task(
+                serve_connection(server, socket.socket(fileno=fd)))
+            sessions.add(task)
+            task.add_done_callback(sessions.discard)
+        if not message and not closed.done():
+            closed.set_result(None)
+
+    async def report():
+        stats = server.get_stats()
+        while True:
+            await asyncio.sleep(1)
+            stats.tick()
+            line = json.dumps(stats.get_stats()) + "\n"
+            try:
+                await loop.sock_sendall(channel, line.encode(ENCODING))
+            except ConnectionError:
+                return
+
+    channel.setblocking(False)
+    loop.add_reader(channel.fileno(), receive)
+    reporter = loop.create_task(report())
+    try:
+        await closed
+    finally:
+        loop.remove_reader(channel.fileno())
+        reporter.cancel()
+        for task in sessions:
+            task.cancel()
+
+
+def run_worker(channel, name, idle_timeout, inherited=()):
+    """The body of a worker process.
+
+    Parameters:
+        channel (socket.socket): The worker's end of its socket pair.
+        name (str): The shared memory block holding the level.
+        idle_timeout (float): Seconds a session may wait between lines.
+        inherited (list<socket.socket>): The front end's ends of every
+            worker's socket pair, closed here so that each worker sees its
+            own channel end when the front end closes it or exits.
+    """
+    for sock in inherited:
+        sock.close()
+    # The front end decides when workers stop; Ctrl-C reaches it too.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    global _memory
+    _memory, template = attach_level(name)
+    server = GameServer.from_game(template, idle_timeout)
+    asyncio.run(run_worker_loop(server, channel))
+
+
+class ShardedServer:
+    """Accepts connections and hands each to one of several workers."""
+
+    def __init__(self, level, workers=DEFAULT_WORKERS,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        """Construct a server that has not started its workers.
+
+        Parameters:
+            level (str): The level every session plays (see share_level).
+            workers (int): The number of worker processes.
+            idle_timeout (float): Seconds a session may wait between lines.
+        """
+        self._level = level
+        self._workers = workers
+        self._idle_timeout = idle_timeout
+        self._ring = HashRing(range(workers))
+        self._memory = None
+        self._processes = []
+        self._channels = []
+        self._pending = [deque() for _ in range(workers)]
+        self._buffers = [b""] * workers
+        self._stats = [ServerStats().get_stats() for _ in range(workers)]
+        self._assigned = [0] * workers
+
+    def start(self):
+        """Shares the level and starts the workers."""
+        self._memory = share_level(self._level)
+        for _ in range(self._workers):
+            ours, theirs = socket.socketpair(socket.AF_UNIX,
+                                             socket.SOCK_STREAM)
+            process = multiprocessing.Process(
+                target=run_worker,
+                args=(theirs, self._memory.name, self._idle_timeout,
+                      self._channels + [ours]),
+                daemon=True)
+            process.start()
+            theirs.close()
+            ours.setblocking(False)
+            self._channels.append(ours)
+            self._processes.append(process)
+
+    def stop(self):
+        """Stops the workers and frees the shared level."""
+        for pending in self._pending:
+            while pending:
+                pending.popleft().close()
+        for channel in self._channels:
+            channel.close()
+        for process in self._processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+        self._channels = []
+        self._processes = []
+
+    def get_worker(self, key):
+        """Returns the index of the worker that serves a session key.
+
+        Parameters:
+            key (str): The session key.
+        """
+        return self._ring.get_node(key)
+
+    def get_stats(self):
+        """Returns the totals of the workers' latest statistics, with each
+        worker's own and the sessions handed to it."""
+        totals = combine_stats(self._stats)
+        totals["per_worker"] = [dict(stats, assigned=assigned)
+                                for stats, assigned
+                                in zip(self._stats, self._assigned)]
+        return totals
+
+    def hand_off(self, conn, address):
+        """Passes an accepted connection to its worker, or queues it if the
+        worker's channel is full.
+
+        Parameters:
+            conn (socket.socket): The connection, closed here once passed.
+            address (tuple): The client's address and port.
+        """
+        worker = self.get_worker(f"{address[0]}:{address[1]}")
+        pending = self._pending[worker]
+        pending.append(conn)
+        if len(pending) == 1:
+            self._send_pending(worker)
+
+    def _send_pending(self, worker):
+        """Passes a worker's queued connections until its channel is full,
+        then waits for the channel to be writable again.
+
+        Parameters:
+            worker (int): The worker's index.
+        """
+        loop = asyncio.get_running_loop()
+        channel = self._channels[worker]
+        pending = self._pending[worker]
+        while pending:
+            try:
+                socket.send_fds(channel, [HANDOFF], [pending[0].fileno()])
+            except BlockingIOError:
+                loop.add_writer(channel.fileno(), self._send_pending, worker)
+                return
+            except ConnectionError:
+                # The worker has gone; its sessions cannot be served.
+                while pending:
+                    pending.popleft().close()
+                break
+            pending.popleft().close()
+            self._assigned[worker] += 1
+        loop.remove_writer(channel.fileno())
+
+    def _receive_stats(self, worker):
+        """Reads the statistics a worker has sent.
+
+        Parameters:
+            worker (int): The worker's index.
+        """
+        try:
+            data = self._channels[worker].recv(65536)
+        except BlockingIOError:
+            return
+        except ConnectionError:
+            data = b""
+        if not data:
+            asyncio.get_running_loop().remove_reader(
+                self._channels[worker].fileno())
+            return
+        *lines, self._buffers[worker] = \
+            (self._buffers[worker] + data).split(b"\n")
+        if lines:
+            self._stats[worker] = json.loads(lines[-1])
+
+    async def handle_stats(self, reader, writer):
+        """Sends the current statistics as one JSON line and closes.
+
+        Parameters:
+            reader (asyncio.StreamReader): The connection's input.
+            writer (asyncio.StreamWriter): The connection's output.
+        """
+        writer.write((json.dumps(self.get_stats()) + "\n").encode(ENCODING))
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def report(self, interval):
+        """Logs the totals to stderr periodically.
+
+        Parameters:
+            interval (float): Seconds between log lines.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            totals = combine_stats(self._stats)
+            totals["assigned"] = self._assigned
+            print(json.dumps(totals), file=sys.stderr, flush=True)
+
+    async def serve(self, host, port, stats_port=None, stats_interval=10):
+        """Accepts connections until cancelled. start() must be called first.
+
+        Parameters:
+            host (str): The address to listen on.
+            port (int): The game port.
+            stats_port (int): The statistics port, or None for none.
+            stats_interval (float): Seconds between stderr statistics, or 0.
+        """
+        loop = asyncio.get_running_loop()
+        for worker, channel in enumerate(self._channels):
+            loop.add_reader(channel.fileno(), self._receive_stats, worker)
+        tasks = []
+        if stats_port is not None:
+            server = await asyncio.start_server(self.handle_stats, host,
+                                                stats_port)
+            tasks.append(asyncio.create_task(server.serve_forever()))
+        if stats_interval:
+            tasks.append(asyncio.create_task(self.report(stats_interval)))
+
+        with socket.create_server((host, port), backlog=1024) as listener:
+            listener.setblocking(False)
+            try:
+                while True:
+                    self.hand_off(*await loop.sock_accept(listener))
+            finally:
+                for task in tasks:
+                    task.cancel()
+                for channel in self._channels:
+                    loop.remove_reader(channel.fileno())
+                    loop.remove_writer(channel.fileno())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve games over TCP from several worker processes.")
+    parser.add_argument("level", nargs="?", default="game1.txt",
+                        help="level file (text or compiled) every session "
+                             "plays")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--stats-port", type=int,
+                        help="port that answers with the statistics")
+    parser.add_argument("--stats-interval", type=float, default=10,
+                        help="seconds between statistics on stderr (0: "
+                             "never)")
+    parser.add_argument("--idle-timeout", type=float,
+                        default=DEFAULT_IDLE_TIMEOUT,
+                        help="seconds a session may wait between lines")
+    args = parser.parse_args()
+    if not hasattr(socket, "send_fds"):
+        sys.exit("passing sockets between processes needs Unix")
+
+    # Stop cleanly, freeing the shared level, when asked to terminate.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    server = ShardedServer(args.level, args.workers, args.idle_timeout)
+    try:
+        server.start()
+        asyncio.run(server.serve(args.host, args.port, args.stats_port,
+                                 args.stats_interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Find the fewest moves needed to win a game.
+
+The solver searches the states a game can reach: the player's position,
+whether they hold a key and which MoveIncrease items they have collected.
+States are packed into single integers,
+
+    state = position + cells * (key + 2 * collected_mask)
+
+where position is the flat index row * width + col, so visited sets and
+parent links hold ints rather than tuples of objects.
+
+The rules are those of GameLogic.step: walking into a tile whose Entity
+cannot be collided with is a wasted move, picking up a key lets the door
+be opened, each MoveIncrease adds its moves once, and the game is lost
+when a move leaves the player with no moves unless that move wins.
+Positions off the grid are treated as impassable.
+
+The search first ignores the move budget, tracking only position and key.
+If that shortest route also wins within the budget it is optimal, and if
+even the budget plus every MoveIncrease falls short of it the game cannot
+be won. Only otherwise are collected items searched as well. Because the
+number of moves left after t moves is fixed by t and the set of
+MoveIncrease items collected, reaching a state first (breadth-first) also
+means reaching it with the most moves left, so no state needs to be
+expanded twice.
+"""
+
+import argparse
+
+from a2 import GameLogic
+from a2_support import *
+from distances import distance_field, grid_offsets
+
+# Directions in the order grid_offsets lists them.
+_DIRECTION_NAMES = tuple(DIRECTIONS)
+
+
+class Solution:
+    """A shortest winning sequence of actions."""
+
+    __slots__ = ("_actions",)
+
+    def __init__(self, actions):
+        """Construct a solution.
+
+        Parameters:
+            actions (list<str>): The directions to move in, in order.
+        """
+        self._actions = actions
+
+    def get_moves(self):
+        """Returns the number of moves the solution takes."""
+        return len(self._actions)
+
+    def get_actions(self):
+        """Returns the directions to move in, in order."""
+        return self._actions
+
+
+def _path(parents, state):
+    """Follows parent links back from a state to the start.
+
+    Parameters:
+        parents: Maps a state to previous_state * 4 + direction index, or -1
+            for the start state.
+        state (int): The state to walk back from.
+
+    Returns:
+        (list<str>): The directions from the start to the state.
+    """
+    actions = []
+    link = parents[state]
+    while link != -1:
+        state, direction = divmod(link, 4)
+        actions.append(_DIRECTION_NAMES[direction])
+        link = parents[state]
+    actions.reverse()
+    return actions
+
+
+def solve(game, limit_moves=True):
+    """Find a shortest winning sequence of moves from a game's current state.
+
+    Parameters:
+        game (GameLogic): The game to solve. It is not modified.
+        limit_moves (bool): If False, ignore the move budget and find the
+            shortest route to the door with a key.
+
+    Returns:
+        (Solution): A shortest winning sequence, or None if the game cannot
+            be won.
+    """
+    snapshot = game.snapshot()
+    if snapshot.won():
+        return Solution([])
+    if limit_moves and game.is_over():
+        return None
+    level = snapshot.get_level()
+    grid = level.get_grid()
+    width = grid.get_width()
+    cells = width * grid.get_height()
+    collected = snapshot.get_collected()
+
+    def indices(tile):
+        return {row * width + col for row, col in level.get_positions(tile)
+                if (row, col) not in collected}
+
+    doors = indices(DOOR)
+    keys = indices(KEY)
+    has_key = 1 if snapshot.get_inventory() else 0
+    if not doors or (not keys and not has_key):
+        return None
+
+    row, col = snapshot.get_position()
+    if not grid.in_bounds((row, col)):
+        return None
+    start = row * width + col
+    tiles = grid.to_bytes()
+    passable = level.get_passable()
+    offsets = grid_offsets(width)
+
+    shortest = _search_unlimited(tiles, passable, width, cells, offsets,
+                                 start, has_key, keys, doors)
+    if not limit_moves or shortest is None or _wins(game, shortest):
+        return shortest
+
+    bonuses = {}
+    for row, col in level.get_positions(MOVE_INCREASE):
+        if (row, col) not in collected:
+            bonuses[row * width + col] = \
+                (1 << len(bonuses), level.get_entity((row, col)).moves)
+    extra = sum(moves for _, moves in bonuses.values())
+    if snapshot.get_moves() + extra < shortest.get_moves():
+        return None
+    to_door = game.get_distance_field(DOOR)
+    via_key = distance_field(tiles, passable, width, grid.get_height(),
+                             {index: to_door[index] for index in keys
+                              if to_door[index] >= 0})
+    return _search(tiles, passable, width, cells, offsets, start, has_key,
+                   keys, doors, bonuses, snapshot.get_moves(),
+                   (via_key, to_door))
+
+
+def _wins(game, solution):
+    """Returns True if playing a solution on a copy of the game wins it.
+
+    Parameters:
+        game (GameLogic): The game the solution starts from.
+        solution (Solution): The moves to play.
+    """
+    trial = game.fork()
+    for action in solution.get_actions():
+        if trial.step(action).is_over():
+            break
+    return trial.won()
+
+
+def _search_unlimited(tiles, passable, width, cells, offsets, start, has_key,
+                      keys, doors):
+    """Breadth-first search over (position, key) ignoring the move budget.
+
+    Parameters are as prepared by solve(). Visited states and parent links
+    share one bytearray with a byte per packed state: 0 for unvisited,
+    otherwise the index of the direction that entered it plus one, plus 4
+    if the key was picked up by that move.
+    """
+    parents = bytearray(2 * cells)
+    start_state = start + cells * has_key
+    parents[start_state] = 255
+    frontier = [start_state]
+
+    while frontier:
+        next_frontier = []
+        for state in frontier:
+            key, index = divmod(state, cells)
+            col = index % width
+            for number, (direction, offset, drow, dcol) in enumerate(offsets):
+                target = index + offset
+                if not (0 <= target < cells and 0 <= col + dcol < width):
+                    continue
+                if not passable[tiles[target]]:
+                    continue
+                target_key = key or target in keys
+                if target_key and target in doors:
+                    actions = [direction]
+                    while state != start_state:
+                        link = parents[state] - 1
+                        number = link & 3
+                        actions.append(offsets[number][0])
+                        state -= offsets[number][1]
+                        if link & 4:
+                            state -= cells
+                    actions.reverse()
+                    return Solution(actions)
+                target_state = target + cells * target_key
+                if not parents[target_state]:
+                    parents[target_state] = \
+                        number + 1 + (4 if target_key != key else 0)
+                    next_frontier.append(target_state)
+        frontier = next_frontier
+    return None
+
+
+def _search(tiles, passable, width, cells, offsets, start, has_key, keys,
+            doors, bonuses, moves, fields):
+    """Breadth-first search over (position, key, collected items).
+
+    Parameters are as prepared by solve(); bonuses maps the flat index of
+    each uncollected MoveIncrease to (mask bit, extra moves), and moves is
+    the number of moves the player has left. fields holds two distance
+    fields, to the door through the nearest useful key and straight to the
+    door, indexed by whether the key is held. They are admissible bounds:
+    states that could not reach the door even if every remaining
+    MoveIncrease were collected on the way are pruned.
+    """
+    extra = sum(bonus for _, bonus in bonuses.values())
+
+    start_state = start + cells * has_key
+    parents = {start_state: -1}
+    mask_moves = {0: moves}
+    frontier = [start_state]
+    taken = 0
+
+    while frontier:
+        taken += 1
+        next_frontier = []
+        for state in frontier:
+            flags, index = divmod(state, cells)
+            key = flags & 1
+            mask = flags >> 1
+            left = mask_moves[mask] - taken
+            col = index % width
+            for number, (direction, offset, drow, dcol) in enumerate(offsets):
+                target = index + offset
+                if not (0 <= target < cells and 0 <= col + dcol < width):
+                    continue
+                if not passable[tiles[target]]:
+                    continue
+                target_key = key or target in keys
+                if target_key and target in doors:
+                    return Solution(_path(parents, state) + [direction])
+                target_mask = mask
+                target_left = left
+                bonus = bonuses.get(target)
+                if bonus is not None and not mask & bonus[0]:
+                    target_mask = mask | bonus[0]
+                    target_left += bonus[1]
+                    if target_mask not in mask_moves:
+                        mask_moves[target_mask] = mask_moves[mask] + bonus[1]
+                if target_left <= 0:
+                    continue
+                needed = fields[target_key][target]
+                unused = extra - (mask_moves[target_mask] - moves)
+                if needed < 0 or target_left + unused < needed:
+                    continue
+                target_state = target + cells * (target_key + 2 * target_mask)
+                if target_state not in parents:
+                    parents[target_state] = state * 4 + number
+                    next_frontier.append(target_state)
+        frontier = next_frontier
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print the fewest moves needed to win each level.")
+    parser.add_argument("levels", nargs="+", help="level files")
+    parser.add_argument("--unlimited", action="store_true",
+                        help="ignore the move budget")
+    args = parser.parse_args()
+
+    for level in args.levels:
+        solution = solve(GameLogic(level), limit_moves=not args.unlimited)
+        if solution is None:
+            print(f"{level}: no solution")
+        else:
+            print(f"{level}: {solution.get_moves()} moves "
+                  f"{''.join(solution.get_actions())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Incremental ANSI rendering for playing in a terminal.
+
+GameApp.draw prints the whole dungeon every turn, although a move
+usually changes only the cell the player left and the one they entered.
+DiffRenderer draws the dungeon once and keeps the glyph of every cell it
+drew. Each later frame looks only at the cells that can have changed (the
+player's previous and current cells, the cells whose items were collected
+since the previous frame, plus any the caller names), compares them with
+the kept glyphs and writes an ANSI cursor move and the new glyph for each
+one that differs. Collected cells are found from GameLogic.get_collected,
+so a batch of moves that picks an item up on the way is drawn correctly.
+A frame costs O(changed cells) and a typical move writes a few dozen bytes
+instead of the whole map.
+
+The screen is redrawn in full on the first frame, when the dungeon or
+terminal size changes and after invalidate(). Callers that change the game
+in other ways (such as GameLogic.restore) must call invalidate().
+
+Usage:
+    python terminal.py game2.txt
+"""
+
+import argparse
+import shutil
+import sys
+
+from a2 import GameApp, GameLogic
+from a2_support import *
+
+CSI = "\x1b["
+CLEAR_SCREEN = CSI + "H" + CSI + "2J"
+CLEAR_LINE = CSI + "K"
+CLEAR_BELOW = CSI + "J"
+
+# Entering this action (Ctrl-L) redraws the whole screen.
+REDRAW = "\x0c"
+
+
+def move_to(row, col):
+    """Returns the ANSI sequence that moves the cursor to a screen cell.
+
+    Parameters:
+        row (int): The row, counted from 0.
+        col (int): The column, counted from 0.
+    """
+    return f"{CSI}{row + 1};{col + 1}H"
+
+
+def cell_glyph(game, position):
+    """Returns the character Display shows for a cell of a game.
+
+    Parameters:
+        game (GameLogic): The game being drawn.
+        position (tuple<int, int>): The cell.
+    """
+    entity = game.get_entity(position)
+    if entity is not None:
+        return entity.get_id()
+    if position == game.get_player().get_position():
+        return PLAYER
+    return SPACE
+
+
+class DiffRenderer:
+    """Draws a game with ANSI sequences, rewriting only changed cells.
+
+    The dungeon occupies the top rows of the screen, followed by the moves
+    left, a blank line and then the messages of the frame. The cursor is
+    left after the messages, where the next prompt is shown.
+    """
+
+    def __init__(self, stream=None):
+        """Construct a renderer.
+
+        Parameters:
+            stream (io.TextIOBase): Where frames are written (default:
+                sys.stdout). Each frame is a single write.
+        """
+        self._stream = stream
+        self._frame = None
+        self._size = None
+        self._terminal_size = None
+        self._player = None
+        self._collected = frozenset()
+        self._moves = None
+        self._bytes_written = 0
+
+    def invalidate(self):
+        """Makes the next frame redraw the whole screen."""
+        self._frame = None
+
+    def get_bytes_written(self):
+        """Returns the number of characters written in all frames so far."""
+        return self._bytes_written
+
+    def render(self, game, messages=(), dirty=()):
+        """Draw a frame.
+
+        Parameters:
+            game (GameLogic): The game to draw.
+            messages (list<str>): Lines to show below the dungeon.
+            dirty (iterable<tuple<int, int>>): Other cells that may have
+                changed since the previous frame.
+        """
+        size = game.get_dungeon_dimensions()
+        terminal_size = shutil.get_terminal_size()
+        if self._frame is None or size != self._size \
+                or terminal_size != self._terminal_size:
+            self._size = size
+            self._terminal_size = terminal_size
+            parts = self._redraw(game)
+        else:
+            parts = self._patch(game, dirty)
+
+        height = size[0]
+        moves = game.get_player().moves_remaining()
+        if moves != self._moves:
+            self._moves = moves
+            parts.append(move_to(height, 0))
+            parts.append(f"Moves left: {moves}" + CLEAR_LINE)
+        parts.append(move_to(height + 2, 0) + CLEAR_BELOW)
+        for text in messages:
+            parts.append(text + "\n")
+
+        frame = "".join(parts)
+        stream = self._stream or sys.stdout
+        stream.write(frame)
+        stream.flush()
+        self._bytes_written += len(frame)
+
+    def _redraw(self, game):
+        """Returns the parts of a frame that draws the whole dungeon.
+
+        Parameters:
+            game (GameLogic): The game to draw.
+        """
+        player = game.get_player().get_position()
+        display = Display(game.get_entities(), self._size,
+                          game.get_static_rows(), game.get_collected())
+        text = display.render_game(player)
+        self._frame = bytearray(text.replace("\n", ""), "latin-1")
+        self._player = player
+        self._collected = frozenset(game.get_collected())
+        self._moves = None
+        return [CLEAR_SCREEN, text]
+
+    def _patch(self, game, dirty):
+        """Returns the parts of a frame that rewrite the changed cells.
+
+        Parameters:
+            game (GameLogic): The game to draw.
+            dirty (iterable<tuple<int, int>>): Other cells that may have
+                changed since the previous frame.
+        """
+        height, width = self._size
+        player = game.get_player().get_position()
+        candidates = {self._player, player}
+        candidates.update(dirty)
+        collected = game.get_collected()
+        if collected != self._collected:
+            candidates.update(self._collected.symmetric_difference(collected))
+            self._collected = frozenset(collected)
+        self._player = player
+        parts = []
+        for position in candidates:
+            row, col = position
+            if not (0 <= row < height and 0 <= col < width):
+                continue
+            glyph = cell_glyph(game, position)
+            index = row * width + col
+            if self._frame[index] != ord(glyph):
+                self._frame[index] = ord(glyph)
+                parts.append(move_to(row, col) + glyph)
+        return parts
+
+
+class TerminalGameApp(GameApp):
+    """A GameApp that draws with a DiffRenderer.
+
+    Messages are shown below the dungeon in the next frame. Entering REDRAW
+    at a prompt redraws the whole screen.
+    """
+
+    def __init__(self, dungeon_name="game1.txt", stream=None):
+        """Construct the app.
+
+        Parameters:
+            dungeon_name (str): The level to play.
+            stream (io.TextIOBase): Where frames are written (default:
+                sys.stdout).
+        """
+        self._game = GameLogic(dungeon_name)
+        self._writer = FrameWriter(stream)
+        self._renderer = DiffRenderer(self._writer)
+        self._messages = []
+
+    def play(self):
+        """Plays the game, then draws the final frame."""
+        super().play()
+        self.draw()
+
+    def read_action(self, prompt):
+        """Reads a line from the player, handling redraw requests.
+
+        Parameters:
+            prompt (str): The prompt to show.
+        """
+        action = super().read_action(prompt)
+        while action == REDRAW:
+            self._renderer.invalidate()
+            self.draw()
+            action = super().read_action(prompt)
+        return action
+
+    def show_message(self, text):
+        """Queues a message for the next frame.
+
+        Parameters:
+            text (str): The message to show.
+        """
+        self._messages.append(text)
+
+    def draw(self):
+        """Draws the changes since the last frame and any queued messages."""
+        self._renderer.render(self._game, self._messages)
+        self._messages = []
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play a level with incremental terminal drawing.")
+    parser.add_argument("level", nargs="?", default="game1.txt",
+                        help="level file")
+    args = parser.parse_args()
+    TerminalGameApp(args.level).play()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 
 import inspect
+import io
+import json
+import re
+import tempfile
 from pathlib import Path
 from typing import Dict, List, Tuple
 
@@ -8,6 +12,35 @@ from testrunner import AttributeGuesser, OrderedTestCase, RedirectStdIO, TestMas
 
 Position = Tuple[int, int]
 
+ANSI_SEQUENCE = re.compile(r'\x1b\[(\d*)(?:;(\d*))?([A-Za-z])')
+
+
+def replay_ansi(text: str, rows: int = 30, cols: int = 80) -> List[str]:
+    """ plays the cursor moves and clears that terminal.py writes onto a blank screen """
+    screen = [[' '] * cols for _ in range(rows)]
+    row = col = 0
+    pieces = ANSI_SEQUENCE.split(text)
+    for index in range(0, len(pieces), 4):
+        for char in pieces[index]:
+            if char == '\n':
+                row, col = row + 1, 0
+            else:
+                screen[row][col] = char
+                col += 1
+        if index + 3 >= len(pieces):
+            break
+        first, second, command = pieces[index + 1:index + 4]
+        if command == 'H':
+            row, col = int(first or 1) - 1, int(second or 1) - 1
+        elif command == 'J' and first == '2':
+            screen = [[' '] * cols for _ in range(rows)]
+        elif command == 'J':
+            screen[row][col:] = [' '] * (cols - col)
+            screen[row + 1:] = [[' '] * cols for _ in range(row + 1, rows)]
+        elif command == 'K':
+            screen[row][col:] = [' '] * (cols - col)
+    return [''.join(line).rstrip() for line in screen]
+
 
 class Entity:
     def __init__(self): pass
@@ -577,6 +610,95 @@ class TestGameLogic(TestFunctionality):
         result = game.get_dungeon_size()
         self.assertEqual(result, 5)
 
+    def assertLevel(self, text: str, rows: List[str], dimensions: Tuple[int, int]):
+        """ assert a level file loads with the given dimensions and draws as rows """
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'level.txt'
+            path.write_text(text)
+            game = self.a2.GameLogic.from_level(self.a2.Level.from_file(str(path)), 9)
+        self.assertEqual(game.get_dungeon_dimensions(), dimensions)
+        self.assertEqual(game.get_dungeon_size(), dimensions[1])
+        self.assertEqual(self.a2.render_frame(game), '\n'.join(rows) + '\nMoves left: 9\n\n')
+        return game
+
+    def test_non_square_level(self):
+        """ test GameLogic on a level wider than it is tall """
+        game = self.assertLevel('#########\n#O K   D#\n#########\n',
+                                ['#########', '#O K   D#', '#########'], (3, 9))
+        self.assertEqual(game.get_positions(self.a2.DOOR), [(1, 7)])
+        self.assertIsInstance(game.get_entity((2, 8)), self.a2.Wall)
+        self.assertIsNone(game.get_entity((3, 0)))
+        self.assertIsNone(game.get_entity((0, 9)))
+
+    def test_ragged_level(self):
+        """ test short rows of a ragged level are padded with walls """
+        game = self.assertLevel('#####\n#O K\n#D\n#####\n',
+                                ['#####', '#O K#', '#D###', '#####'], (4, 5))
+        for position in [(1, 4), (2, 2), (2, 3), (2, 4)]:
+            self.assertIsInstance(game.get_entity(position), self.a2.Wall)
+
+    def test_items_per_cell(self):
+        """ test each Item on a level is its own instance while walls and doors are shared """
+        with tempfile.TemporaryDirectory() as directory:
+            name = str(Path(directory) / 'items.txt')
+            Path(name).write_text('#######\n#OKKMMD\n#######\n')
+            level = self.a2.Level.from_file(name)
+        keys = [level.get_entity((1, col)) for col in (2, 3)]
+        increases = [level.get_entity((1, col)) for col in (4, 5)]
+        for first, second in (keys, increases):
+            self.assertIsNot(first, second)
+            self.assertEqual(type(first), type(second))
+        self.assertIs(level.get_entity((1, 2)), keys[0])
+        self.assertIs(level.get_entities()[(1, 5)], increases[1])
+        self.assertIs(level.get_entity((0, 0)), level.get_entity((2, 6)))
+        self.assertIs(level.get_entity((1, 6)), self.a2.DOOR_TILE)
+        tile_key = level.get_tile_entity(self.a2.KEY)
+        self.assertIsInstance(tile_key, self.a2.Key)
+        self.assertNotIn(tile_key, keys)
+
+    def test_load_without_copy(self):
+        """ test a level is loaded into one read-only buffer, not copied """
+        import tracemalloc
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'wide.txt'
+            path.write_text('\n'.join(['#' * 400, '#OKD' + ' ' * 395 + '#'] + ['#' * 400] * 198) + '\n')
+            tracemalloc.start()
+            try:
+                level = self.a2.Level.from_file(str(path))
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        self.assertLess(peak, 1.5 * 400 * 200)
+        with self.assertRaises(TypeError):
+            level.get_grid().set_tile((0, 0), ' ')
+
+    def test_move_budget_paths(self):
+        """ test GameLogic finds the move budget however the level path is written """
+        for name in ['game1.txt', './game1.txt', str(Path('game1.txt').resolve())]:
+            self.assertEqual(self.a2.GameLogic(name).get_player().moves_remaining(), 7)
+
+    def test_move_budget_other_directory(self):
+        """ test GameLogic reads the budget of a level elsewhere from the manifest next to it """
+        text = Path('game1.txt').read_text()
+        with tempfile.TemporaryDirectory() as directory:
+            levels = Path(directory) / 'levels'
+            levels.mkdir()
+            (levels / 'game1.txt').write_text(text)
+            (levels / 'game5.txt').write_text(text)
+            (levels / 'game6.txt').write_text(text)
+            (levels / 'levels.json').write_text(json.dumps(
+                {'levels': {'game1.txt': {'moves': 3}, 'game5.txt': {'moves': 4}}}))
+            (Path(directory) / 'levels.json').write_text(json.dumps(
+                {'levels': {'levels/game6.txt': {'moves': 5}}}))
+
+            for name, moves in [('game1.txt', 3), ('game5.txt', 4), ('game6.txt', 5)]:
+                game = self.a2.GameLogic(str(levels / name))
+                self.assertEqual(game.get_player().moves_remaining(), moves)
+
+            (levels / 'game7.txt').write_text(text)
+            with self.assertRaises(KeyError):
+                self.a2.GameLogic(str(levels / 'game7.txt'))
+
     @skipIfFailed(TestDesign, TestDesign.test_classes_and_functions_defined, tag='Wall')
     @skipIfFailed(TestDesign, TestDesign.test_classes_and_functions_defined, tag='Key')
     @skipIfFailed(TestDesign, TestDesign.test_classes_and_functions_defined, tag='Door')
@@ -822,6 +944,60 @@ class TestGameLogic(TestFunctionality):
         self.assertEqual(player.moves_remaining(), 17)
         self.assertIsNone(ret, msg="This function should not return a value")
 
+    @skipIfFailed(test_name=test_key_on_hit)
+    @skipIfFailed(test_name=test_get_game_information)
+    def test_game_information_after_key_on_hit(self):
+        """ test GameLogic.get_game_information is updated by Key.on_hit """
+        game = self.a2.GameLogic('game1.txt')
+        player = game.get_player()
+        player.set_position((1, 3))
+        game.get_entity((1, 3)).on_hit(game)
+        result = game.get_game_information()
+        self.assertNotIn((1, 3), result)
+        self.assertEqual(game.get_positions('K'), [])
+        self.assertIsInstance(result[(3, 2)], self.a2.Door)
+
+    @skipIfFailed(test_name=test_game_information_after_key_on_hit)
+    def test_key_on_hit_other_game(self):
+        """ test Key.on_hit does not affect other games on the same level """
+        game = self.a2.GameLogic('game1.txt')
+        other = self.a2.GameLogic('game1.txt')
+        game.get_player().set_position((1, 3))
+        game.get_entity((1, 3)).on_hit(game)
+        self.assertIsNone(game.get_entity((1, 3)))
+        self.assertIsInstance(other.get_entity((1, 3)), self.a2.Key)
+        self.assertIn((1, 3), other.get_game_information())
+
+    @skipIfFailed(test_name=test_key_on_hit_other_game)
+    def test_fork(self):
+        """ test GameLogic.fork copies the game state """
+        game = self.a2.GameLogic('game1.txt')
+        player = game.get_player()
+        player.set_position((1, 3))
+        game.get_entity((1, 3)).on_hit(game)
+        fork = game.fork()
+        fork.move_player('S')
+        fork.get_player().change_move_count(-1)
+        self.assertEqual(fork.get_player().get_position(), (2, 3))
+        self.assertEqual(player.get_position(), (1, 3))
+        self.assertEqual(fork.get_player().moves_remaining(), 6)
+        self.assertEqual(player.moves_remaining(), 7)
+        self.assertEqual(len(fork.get_player().get_inventory()), 1)
+        self.assertIsNone(fork.get_entity((1, 3)))
+
+    @skipIfFailed(test_name=test_fork)
+    def test_snapshot_restore(self):
+        """ test GameLogic.restore returns to a snapshot """
+        game = self.a2.GameLogic('game1.txt')
+        snapshot = game.snapshot()
+        player = game.get_player()
+        player.set_position((1, 3))
+        game.get_entity((1, 3)).on_hit(game)
+        game.restore(snapshot)
+        self.assertEqual(game.get_player().get_position(), (2, 1))
+        self.assertEqual(game.get_player().get_inventory(), [])
+        self.assertIsInstance(game.get_entity((1, 3)), self.a2.Key)
+
     @skipIfFailed(test_name=test_key_on_hit)
     @skipIfFailed(test_name=test_won)
     def test_door_on_hit_with_key(self):
@@ -851,6 +1027,55 @@ class TestGameLogic(TestFunctionality):
         self.assertIsNone(ret, msg="This function should not return a value")
 
 
+    def test_step_win(self):
+        """ test GameLogic.step plays a winning game without printing """
+        game = self.a2.GameLogic('game1.txt')
+        results = [game.step(action) for action in ['D', 'D', 'W', 'S', 'S', 'A']]
+        self.assertEqual(results[0].get_events(), (('moved', (2, 2)),))
+        self.assertEqual(results[2].get_events()[1][0], 'collected')
+        self.assertEqual([r.get_moves() for r in results], [6, 5, 4, 3, 2, 1])
+        self.assertIs(results[-1].won(), True)
+        self.assertIs(results[-1].is_over(), True)
+        self.assertEqual(game.step('D').get_events(), ())
+
+    def test_step_messages(self):
+        """ test GameLogic.step reports what play would print """
+        game = self.a2.GameLogic('game1.txt')
+        self.assertEqual(game.step('A').get_events(), (('blocked', 'A'),))
+        self.assertEqual(game.step('I').get_events(), (('invalid', 'I'),))
+        kind, (direction, entity) = game.step('I D').get_events()[0]
+        self.assertEqual((kind, direction, entity), ('investigated', 'D', None))
+        game.get_player().set_position((2, 2))
+        self.assertEqual(game.step('S').get_events(), (('moved', (3, 2)), ('no_key', None)))
+        self.assertEqual(game.step('Q').get_events(), (('confirm_quit', None),))
+        result = game.step('y')
+        self.assertIs(result.has_quit(), True)
+        self.assertEqual(result.get_moves(), 4)
+
+
+    def test_static_rows(self):
+        """ test GameLogic.get_static_rows and drawing from them after collecting the key """
+        game = self.a2.GameLogic('game1.txt')
+        self.assertEqual(game.get_static_rows(), ('#####', '# #K#', '#   #', '# D #', '#####'))
+        for action in ['D', 'D', 'W']:
+            game.step(action)
+        self.assertEqual(game.get_collected(), {(1, 3)})
+        info, size = game.get_game_information(), game.get_dungeon_dimensions()
+        position = game.get_player().get_position()
+        cached = self.a2.Display(info, size, game.get_static_rows(), game.get_collected())
+        self.assertEqual(cached.render_game(position), '#####\n# #O#\n#   #\n# D #\n#####')
+        self.assertEqual(cached.render_game(position), self.a2.Display(info, size).render_game(position))
+
+    def test_step_hint(self):
+        """ test GameLogic.step HINT points towards the key then the door """
+        game = self.a2.GameLogic('game1.txt')
+        self.assertEqual(game.step('HINT').get_events(), (('hint', 'D'),))
+        self.assertEqual(game.get_player().moves_remaining(), 7)
+        for action in ['D', 'D', 'W']:
+            game.step(action)
+        self.assertEqual(game.step('HINT').get_events(), (('hint', 'S'),))
+        self.assertEqual(game.get_distance_field('D')[1 * 5 + 3], 3)
+
 @skipIfFailed(TestDesign, TestDesign.test_classes_and_functions_defined, tag='GameApp')
 class TestGameApp(TestFunctionality):
     """ Test GameApp """
@@ -896,6 +1121,33 @@ class TestGameApp(TestFunctionality):
         expected = self.load_test_data('game_draw.out')
         self.assertEqual(stdio.stdout, expected)
 
+    def test_play_batch(self):
+        """ test GameApp.play runs a batch of moves with one draw """
+        app = self.a2.GameApp()
+        with RedirectStdIO(stdinout=True) as stdio:
+            stdio.stdin = '2DW\nSSA\n'
+            app.play()
+        self.assertEqual(stdio.stdinout.count('Moves left'), 2)
+        self.assertIn('Moves left: 4', stdio.stdinout)
+        self.assertTrue(stdio.stdinout.endswith(self.a2.WIN_TEXT + '\n'))
+
+    def test_expand_command(self):
+        """ test expand_command splits batches and leaves other lines alone """
+        self.assertEqual(list(self.a2.expand_command('3DW')), ['D', 'D', 'D', 'W'])
+        self.assertEqual(list(self.a2.expand_command('DDWSS')), ['D', 'D', 'W', 'S', 'S'])
+        for line in ['D', 'I D', 'I DD', '2', '0D', 'dd', 'hello', '']:
+            self.assertEqual(list(self.a2.expand_command(line)), [line])
+
+    def test_play_null_output(self):
+        """ test GameApp.play shows nothing with a null sink """
+        app = self.a2.GameApp()
+        app.set_output(self.a2.NULL_SINK)
+        with RedirectStdIO(stdin=True, stdout=True) as stdio:
+            stdio.stdin = self.load_test_data('game_win.in')
+            app.play()
+        self.assertEqual(stdio.stdout, '')
+        self.assertIs(app._game.won(), True)
+
     def test_play_help(self):
         """ test GameApp.play help """
         self.assertPlay('game_help.in', 'game_help.out', stop_early=True)
@@ -938,6 +1190,680 @@ class TestGameApp(TestFunctionality):
             self.a2.GameLogic.__init__.__defaults__ = _defaults
 
 
+class TestTerminal(TestFunctionality):
+    """ Test terminal.py """
+
+    def assertScreen(self, screen: List[str], game):
+        """ assert the dungeon and moves on screen are what render_frame draws """
+        height = game.get_dungeon_dimensions()[0]
+        expected = self.a2.render_frame(game).split('\n')[:height + 1]
+        self.assertEqual(screen[:height + 1], [line.rstrip() for line in expected])
+
+    def test_patched_frames(self):
+        """ test DiffRenderer's patched screen matches render_frame after every step """
+        import terminal
+        for name, actions in [('game1.txt', 'ADDWSSA'), ('game2.txt', 'ADDDDWDSSSSSAAA')]:
+            output = io.StringIO()
+            renderer = terminal.DiffRenderer(output)
+            game = self.a2.GameLogic(name)
+            renderer.render(game)
+            self.assertScreen(replay_ansi(output.getvalue()), game)
+            for action in actions:
+                game.step(action)
+                renderer.render(game)
+                self.assertScreen(replay_ansi(output.getvalue()), game)
+            self.assertTrue(game.won())
+            self.assertEqual(output.getvalue().count(terminal.CLEAR_SCREEN), 1)
+
+    def test_play_batch(self):
+        """ test TerminalGameApp redraws an item collected partway through a batch """
+        import terminal
+        output = io.StringIO()
+        app = terminal.TerminalGameApp('game1.txt', output)
+        with RedirectStdIO(stdin=True, stdout=True) as stdio:
+            stdio.stdin = 'DDWS\n'
+            with self.assertRaises(EOFError):
+                app.play()
+        app.draw()
+        screen = replay_ansi(output.getvalue())
+        self.assertEqual(app._game.get_collected(), {(1, 3)})
+        self.assertEqual(screen[1], '# # #')
+        self.assertScreen(screen, app._game)
+
+
+class TestLevelFormat(TestFunctionality):
+    """ Test level_format.py """
+
+    def describe(self, entities) -> dict:
+        """ returns the Entity at each position as a string, since each level has Items of its own """
+        return {position: str(entity) for position, entity in entities.items()}
+
+    def assertSameLevel(self, compiled, text):
+        """ assert a compiled Level holds the same dungeon as the text Level it was compiled from """
+        grid = compiled.get_grid()
+        self.assertEqual((grid.get_height(), grid.get_width()),
+                         (text.get_grid().get_height(), text.get_grid().get_width()))
+        self.assertEqual(grid.to_bytes(), text.get_grid().to_bytes())
+        for tile in [self.a2.WALL, self.a2.KEY, self.a2.DOOR, self.a2.PLAYER, self.a2.MOVE_INCREASE]:
+            self.assertEqual(compiled.get_positions(tile), text.get_positions(tile))
+        self.assertEqual(self.describe(compiled.get_entities()), self.describe(text.get_entities()))
+        self.assertEqual(tuple(compiled.get_static_rows()), text.get_static_rows())
+
+    def test_round_trip(self):
+        """ test a text level compiled and read back plays the same game """
+        import level_format
+        with tempfile.TemporaryDirectory() as directory:
+            for name, moves in [('game1.txt', 7), ('game2.txt', 12), ('game3.txt', 19)]:
+                target = str(Path(directory) / (Path(name).stem + level_format.COMPILED_SUFFIX))
+                level_format.compile_level(name, target, moves)
+                compiled = self.a2.Level.from_compiled(target)
+                self.assertEqual(compiled.get_moves(), moves)
+                self.assertSameLevel(compiled, self.a2.Level.from_file(name))
+
+                game = self.a2.GameLogic.from_level(compiled, moves)
+                expected = self.a2.GameLogic(name)
+                self.assertEqual(self.a2.render_frame(game), self.a2.render_frame(expected))
+                self.assertEqual(game.get_player().get_position(), expected.get_player().get_position())
+                self.assertEqual(self.describe(game.get_game_information()),
+                                 self.describe(expected.get_game_information()))
+
+    def test_ragged(self):
+        """ test a ragged level is compiled padded with walls """
+        import level_format
+        with tempfile.TemporaryDirectory() as directory:
+            source = Path(directory) / 'ragged.txt'
+            source.write_text('#####\n#O K\n#D\n#####\n')
+            target = str(Path(directory) / ('ragged' + level_format.COMPILED_SUFFIX))
+            level_format.compile_level(str(source), target, 5)
+            compiled = self.a2.Level.from_compiled(target)
+            self.assertEqual(tuple(compiled.get_static_rows()), ('#####', '#  K#', '#D###', '#####'))
+            self.assertEqual(compiled.get_positions(self.a2.PLAYER), {(1, 1)})
+            self.assertIsInstance(compiled.get_entity((2, 4)), self.a2.Wall)
+            self.assertSameLevel(compiled, self.a2.Level.from_file(str(source)))
+
+    def test_draw_from_buffer(self):
+        """ test a level decoded from a buffer draws its rows from the buffer """
+        import level_format
+        for name, moves in [('game1.txt', 7), ('game2.txt', 12)]:
+            data = memoryview(level_format.encode_level(self.a2.load_grid(name), moves))
+            compiled = level_format.decode_level(data)
+            level = self.a2.Level(compiled.get_grid(), compiled.get_positions(), compiled.get_moves())
+            rows = level.get_static_rows()
+            self.assertIsInstance(rows, self.a2.GridRows)
+            self.assertEqual(tuple(rows), self.a2.load_level(name).get_static_rows())
+            game = self.a2.GameLogic.from_level(level, moves)
+            expected = self.a2.GameLogic(name)
+            for action in 'DDDDW':
+                game.step(action)
+                expected.step(action)
+                self.assertEqual(self.a2.render_frame(game), self.a2.render_frame(expected))
+
+    def test_not_compiled(self):
+        """ test reading a file that is not a compiled level raises ValueError """
+        import level_format
+        with self.assertRaises(ValueError):
+            level_format.load_compiled('game1.txt')
+        with self.assertRaises(ValueError):
+            level_format.decode_level(b'KCL1')
+
+    def test_truncated(self):
+        """ test a compiled level cut short anywhere raises ValueError """
+        import level_format
+        with tempfile.TemporaryDirectory() as directory:
+            target = str(Path(directory) / 'game2.kcl')
+            level_format.compile_level('game2.txt', target, 12)
+            data = Path(target).read_bytes()
+        for end in (level_format.HEADER.size + 1,
+                    level_format.HEADER.size + level_format.TILE_ENTRY.size,
+                    len(data) - 1):
+            with self.assertRaises(ValueError):
+                level_format.decode_level(data[:end])
+
+
+class TestGenerate(TestFunctionality):
+    """ Test generate.py """
+
+    def test_same_seed(self):
+        """ test the same seed and options give the same level """
+        import generate
+        for seed in range(3):
+            first = generate.generate_level(seed)
+            second = generate.generate_level(seed)
+            self.assertEqual(first.to_text(), second.to_text())
+            self.assertEqual((first.get_min_moves(), first.get_moves()),
+                             (second.get_min_moves(), second.get_moves()))
+        self.assertNotEqual(generate.generate_level(0).to_text(), generate.generate_level(1).to_text())
+
+    def test_levels_are_valid(self):
+        """ test generated levels pass validate.check_level """
+        import generate
+        import validate
+        for seed in range(5):
+            level = generate.generate_level(seed, width=10, height=6)
+            grid = level.get_grid()
+            self.assertEqual((grid.get_height(), grid.get_width()), (6, 10))
+            self.assertIsNone(validate.check_level(grid))
+            self.assertEqual(level.get_moves(), level.get_min_moves() + generate.DEFAULT_SLACK)
+
+
+class TestSolver(TestFunctionality):
+    """ Test solver.py """
+
+    def assertWins(self, game, solution):
+        """ assert playing a solution's actions wins the game """
+        for action in solution.get_actions():
+            game.step(action)
+        self.assertTrue(game.won())
+
+    def test_game1(self):
+        """ test solve finds the 6 move win of game1.txt """
+        import solver
+        solution = solver.solve(self.a2.GameLogic('game1.txt'))
+        self.assertEqual(solution.get_moves(), 6)
+        self.assertWins(self.a2.GameLogic('game1.txt'), solution)
+
+    def test_game2(self):
+        """ test game2.txt can be won with 11 moves but not 10 """
+        import solver
+        level = self.a2.load_level('game2.txt')
+        solution = solver.solve(self.a2.GameLogic.from_level(level, 11))
+        self.assertIsNotNone(solution)
+        self.assertWins(self.a2.GameLogic.from_level(level, 11), solution)
+        self.assertIsNone(solver.solve(self.a2.GameLogic.from_level(level, 10)))
+
+    def test_game3(self):
+        """ test game3.txt cannot be won with its 19 move budget """
+        import solver
+        game = self.a2.GameLogic('game3.txt')
+        self.assertEqual(game.get_player().moves_remaining(), 19)
+        self.assertIsNone(solver.solve(game))
+        self.assertEqual(solver.solve(game, limit_moves=False).get_moves(), 24)
+
+
+class TestValidate(TestFunctionality):
+    """ Test validate.py """
+
+    def check(self, rows: List[str]):
+        """ returns what validate.check_level reports for a level given as rows """
+        import validate
+        return validate.check_level([list(row) for row in rows])
+
+    def assertProblem(self, rows: List[str], code: str, position=None):
+        """ assert check_level rejects a level with the given code and position """
+        problem = self.check(rows)
+        self.assertIsNotNone(problem)
+        self.assertEqual(problem.get_code(), code)
+        self.assertEqual(problem.get_position(), position)
+
+    def test_valid(self):
+        """ test check_level accepts winnable levels """
+        import validate
+        for name in ['game1.txt', 'game2.txt', 'game3.txt']:
+            self.assertIsNone(validate.check_level(self.a2.load_game(name)))
+        self.assertIsNone(self.check(['#####', '#OKD#', '#####']))
+
+    def test_key_unreachable(self):
+        """ test check_level rejects a key walled off from the player """
+        import validate
+        self.assertProblem(['######', '#O#K #', '#D#  #', '######'], validate.KEY_UNREACHABLE, (1, 3))
+
+    def test_door_unreachable(self):
+        """ test check_level rejects a door walled off from the player """
+        import validate
+        self.assertProblem(['######', '#OK#D#', '#  # #', '######'], validate.DOOR_UNREACHABLE, (1, 4))
+
+    def test_missing_player(self):
+        """ test check_level rejects a level without a player """
+        import validate
+        self.assertProblem(['#####', '# KD#', '#####'], validate.MISSING_PLAYER)
+
+
+class TestSessionStore(TestFunctionality):
+    """ Test session_store.py """
+
+    def assertSameGame(self, restored, game):
+        """ assert a restored game is in the same state as the game that was stored """
+        self.assertIsNot(restored, game)
+        self.assertEqual(restored.get_player().get_position(), game.get_player().get_position())
+        self.assertEqual(restored.get_player().moves_remaining(), game.get_player().moves_remaining())
+        self.assertEqual([item.get_id() for item in restored.get_player().get_inventory()],
+                         [item.get_id() for item in game.get_player().get_inventory()])
+        self.assertEqual(restored.get_collected(), game.get_collected())
+        self.assertEqual(restored.won(), game.won())
+        self.assertEqual(restored.is_confirming_quit(), game.is_confirming_quit())
+        self.assertEqual(self.a2.render_frame(restored), self.a2.render_frame(game))
+
+    def test_round_trip(self):
+        """ test spilled games come back with their items, win and quit prompt """
+        import session_store
+        collecting = self.a2.GameLogic('game2.txt')
+        for action in 'DDDDWDSSSSS':
+            collecting.step(action)
+        collecting.step(self.a2.QUIT)
+        self.assertEqual(collecting.get_collected(), {(1, 6), (6, 6)})
+        self.assertTrue(collecting.is_confirming_quit())
+        won = self.a2.GameLogic('game1.txt')
+        for action in 'DDWSSA':
+            won.step(action)
+        self.assertTrue(won.won())
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = session_store.SessionStore(directory, capacity=1)
+            store.add('collecting', collecting, 'game2.txt')
+            store.add('won', won, 'game1.txt')
+            self.assertEqual(store.get_stats()['spilled'], 1)
+            self.assertSameGame(store.get('collecting'), collecting)
+            self.assertIs(store.get('collecting').get_player().get_inventory()[0],
+                          collecting.get_player().get_inventory()[0])
+            self.assertSameGame(store.get('won'), won)
+            self.assertEqual(store.get_stats()['restores'], 2)
+
+            restored = store.get('collecting')
+            restored.step(self.a2.CONFIRM_QUIT)
+            self.assertTrue(restored.has_quit())
+
+    def test_lru_capacity(self):
+        """ test the store keeps at most capacity games in memory, evicting the least recently used """
+        import session_store
+        with tempfile.TemporaryDirectory() as directory:
+            store = session_store.SessionStore(directory, capacity=3)
+            games = {}
+            for number in range(6):
+                key = f'session{number}'
+                games[key] = self.a2.GameLogic('game1.txt')
+                store.add(key, games[key], 'game1.txt')
+                self.assertLessEqual(store.get_stats()['hot'], 3)
+                if number == 2:
+                    store.get('session0')
+            self.assertEqual(len(store), 6)
+            self.assertEqual(store.get_stats()['hot'], 3)
+            self.assertEqual(store.get_stats()['spilled'], 3)
+            self.assertEqual(sorted(Path(directory).iterdir()),
+                             sorted(Path(directory) / f'{key}.ses' for key in ['session0', 'session1', 'session2']))
+
+            self.assertIs(store.get('session5'), games['session5'])
+            self.assertIsNot(store.get('session1'), games['session1'])
+            self.assertEqual(store.get_stats()['hot'], 3)
+            with self.assertRaises(KeyError):
+                store.get('session6')
+
+
+class TestBatchReplay(TestFunctionality):
+    """ Test batch_replay.py """
+
+    def assertSameAsPlay(self, lines: List[str]):
+        """ assert replay ends a game on game1.txt where GameApp.play does """
+        import batch_replay
+        result = batch_replay.replay(self.a2.GameLogic('game1.txt'), lines)
+        app = self.a2.GameApp()
+        with RedirectStdIO(stdinout=True) as stdio:
+            stdio.stdin = ''.join(line + '\n' for line in lines)
+            app.play()
+        player = app._game.get_player()
+        self.assertEqual(result['position'], list(player.get_position()))
+        self.assertEqual(result['moves_left'], player.moves_remaining())
+        self.assertEqual(result['actions'], len(lines))
+        return result
+
+    def test_quit_answer_not_expanded(self):
+        """ test a batch typed at the quit prompt is an answer, not moves """
+        result = self.assertSameAsPlay(['Q', '2D', 'Q', 'y'])
+        self.assertEqual(result['outcome'], 'quit')
+        self.assertEqual(result['position'], [2, 1])
+        self.assertEqual(result['moves_left'], 7)
+
+    def test_transcripts(self):
+        """ test replay scores the recorded transcripts as GameApp.play plays them """
+        for name, outcome in [('game_win.in', 'won'), ('game_lose.in', 'lost')]:
+            lines = (Path('test_data') / name).read_text().splitlines()
+            self.assertEqual(self.assertSameAsPlay(lines)['outcome'], outcome)
+
+
+class BufferWriter:
+    """ a stand-in for asyncio.StreamWriter that keeps what is written and whether it was drained """
+
+    def __init__(self):
+        self.data = b''
+        self.drained = True
+
+    def write(self, data: bytes):
+        self.data += data
+        self.drained = False
+
+    async def drain(self):
+        self.drained = True
+
+
+class TestAsyncApp(TestFunctionality):
+    """ Test async_app.py """
+
+    def assertSameAsPlay(self, file_in: str):
+        """ assert AsyncGameApp writes exactly what GameApp.play prints for a transcript """
+        import asyncio
+        import async_app
+        lines = self.load_test_data(file_in)
+
+        async def play():
+            reader = asyncio.StreamReader()
+            reader.feed_data(lines.encode())
+            reader.feed_eof()
+            writer = BufferWriter()
+            app = async_app.AsyncGameApp(self.a2.GameLogic('game1.txt'), reader, writer)
+            await app.play()
+            return writer
+
+        writer = asyncio.run(play())
+        app = self.a2.GameApp()
+        with RedirectStdIO(stdin=True, stdout=True) as stdio:
+            stdio.stdin = lines
+            app.play()
+        self.assertEqual(writer.data.decode(), stdio.stdout)
+        self.assertTrue(writer.drained)
+
+    def test_win(self):
+        """ test AsyncGameApp plays a winning transcript byte for byte """
+        self.assertSameAsPlay('game_win.in')
+
+    def test_lose(self):
+        """ test AsyncGameApp plays a losing transcript byte for byte """
+        self.assertSameAsPlay('game_lose.in')
+
+    def test_quit(self):
+        """ test AsyncGameApp plays a quitting transcript byte for byte """
+        self.assertSameAsPlay('game_quit_y.in')
+
+
+class TestServer(TestFunctionality):
+    """ Test server.py """
+
+    def expected_output(self, file_in: str) -> str:
+        """ returns what GameApp.play prints for a transcript """
+        app = self.a2.GameApp()
+        with RedirectStdIO(stdin=True, stdout=True) as stdio:
+            stdio.stdin = self.load_test_data(file_in)
+            app.play()
+        return stdio.stdout
+
+    def serve(self, server, clients):
+        """ runs clients against a server listening on a free port and returns their results """
+        import asyncio
+
+        async def run():
+            listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+            port = listener.sockets[0].getsockname()[1]
+            async with listener:
+                results = await asyncio.gather(*(client(port) for client in clients))
+            return results
+
+        return asyncio.run(run())
+
+    def transcript_client(self, file_in: str):
+        """ returns a client that sends a whole transcript and reads until the server hangs up """
+        import asyncio
+        lines = self.load_test_data(file_in)
+
+        async def client(port):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(lines.encode())
+            await writer.drain()
+            output = await reader.read()
+            writer.close()
+            return output.decode()
+
+        return client
+
+    def test_percentiles(self):
+        """ test ServerStats counts sessions and takes percentiles over the latencies """
+        import server
+        stats = server.ServerStats()
+        self.assertEqual(stats.get_stats()['p50_ms'], 0.0)
+        stats.session_opened()
+        stats.session_opened()
+        stats.session_closed()
+        stats.session_closed(timed_out=True)
+        for ms in range(100, 0, -1):
+            stats.record_action(ms / 1000)
+        result = stats.get_stats()
+        self.assertEqual(result['sessions'], 0)
+        self.assertEqual(result['served'], 2)
+        self.assertEqual(result['timeouts'], 1)
+        self.assertEqual(result['actions'], 100)
+        self.assertEqual(result['p50_ms'], 51.0)
+        self.assertEqual(result['p99_ms'], 100.0)
+        self.assertEqual(server.percentile([1.0], 0.99), 1.0)
+
+    def test_transcript(self):
+        """ test a session over TCP plays a transcript exactly as GameApp.play """
+        import server
+        game_server = server.GameServer.from_game(self.a2.GameLogic('game1.txt'))
+        output, = self.serve(game_server, [self.transcript_client('game_win.in')])
+        self.assertEqual(output, self.expected_output('game_win.in'))
+        stats = game_server.get_stats().get_stats()
+        self.assertEqual(stats['sessions'], 0)
+        self.assertEqual(stats['served'], 1)
+        self.assertEqual(stats['timeouts'], 0)
+        self.assertEqual(stats['actions'], 6)
+        self.assertGreater(stats['p99_ms'], 0)
+
+    def test_idle_timeout(self):
+        """ test a connection that sends nothing is told so and closed """
+        import asyncio
+        import server
+        game_server = server.GameServer.from_game(self.a2.GameLogic('game1.txt'),
+                                                  idle_timeout=0.05)
+
+        async def idle(port):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            output = await reader.read()
+            writer.close()
+            return output.decode()
+
+        output, = self.serve(game_server, [idle])
+        self.assertTrue(output.startswith(self.a2.render_frame(self.a2.GameLogic('game1.txt'))))
+        self.assertTrue(output.endswith(self.a2.ACTION_PROMPT + '\n' + server.IDLE_TEXT + '\n'))
+        stats = game_server.get_stats().get_stats()
+        self.assertEqual(stats['sessions'], 0)
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['actions'], 0)
+
+    def test_stored_sessions(self):
+        """ test sessions spilled by StoredSessionApp between lines play as GameApp.play """
+        import asyncio
+        import server
+        import session_store
+        prompt = self.a2.ACTION_PROMPT.encode()
+        lines = self.load_test_data('game_win.in').splitlines(keepends=True)
+
+        async def client(port):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            output = await reader.readuntil(prompt)
+            for line in lines[:-1]:
+                writer.write(line.encode())
+                output += await reader.readuntil(prompt)
+            writer.write(lines[-1].encode())
+            output += await reader.read()
+            writer.close()
+            return output.decode()
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = session_store.SessionStore(directory, capacity=1)
+            game_server = server.GameServer('game1.txt', store=store)
+            outputs = self.serve(game_server, [client, client])
+            self.assertEqual(len(store), 0)
+        self.assertEqual(outputs, [self.expected_output('game_win.in')] * 2)
+        stats = game_server.get_stats().get_stats()
+        self.assertEqual(stats['served'], 2)
+        self.assertEqual(stats['actions'], 12)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertGreater(stats['restores'], 0)
+        self.assertEqual(stats['hot'], 0)
+
+
+class TestViewport(TestFunctionality):
+    """ Test viewport.py """
+
+    def test_scroll(self):
+        """ test a window centres on the player, scrolls at its margins and stays on the map """
+        from viewport import _scroll
+        self.assertEqual(_scroll(None, 10, 5, 20, 1), 8)
+        self.assertEqual(_scroll(None, 0, 5, 20, 1), 0)
+        self.assertEqual(_scroll(None, 19, 5, 20, 1), 15)
+        self.assertEqual(_scroll(8, 9, 5, 20, 1), 8)
+        self.assertEqual(_scroll(8, 11, 5, 20, 1), 8)
+        self.assertEqual(_scroll(8, 12, 5, 20, 1), 9)
+        self.assertEqual(_scroll(8, 8, 5, 20, 1), 7)
+        self.assertEqual(_scroll(15, 19, 5, 20, 1), 15)
+        self.assertEqual(_scroll(1, 0, 5, 20, 1), 0)
+        self.assertEqual(_scroll(8, 9, 5, 20, 10), 7)
+
+    def test_smaller_map(self):
+        """ test a map no larger than the window is shown whole from the origin """
+        from viewport import _scroll
+        self.assertEqual(_scroll(None, 3, 10, 5, 2), 0)
+        self.assertEqual(_scroll(4, 4, 5, 5, 2), 0)
+
+    def test_camera_edges(self):
+        """ test the camera clamps its window to the corners of the map """
+        from viewport import Camera
+        camera = Camera(3, 4, 1)
+        self.assertEqual(camera.get_size(), (3, 4))
+        self.assertEqual(camera.follow((0, 0), (10, 12)), (0, 0, 3, 4))
+        self.assertEqual(camera.follow((9, 11), (10, 12)), (7, 8, 3, 4))
+        self.assertEqual(camera.follow((8, 10), (10, 12)), (7, 8, 3, 4))
+        camera.recentre()
+        self.assertEqual(camera.follow((5, 5), (10, 12)), (4, 3, 3, 4))
+        self.assertEqual(Camera(20, 60).follow((2, 1), (4, 5)), (0, 0, 4, 5))
+
+    def test_whole_map(self):
+        """ test a window larger than the map draws exactly what Display draws """
+        from viewport import Camera, ViewportDisplay
+        game = self.a2.GameLogic('game2.txt')
+        player = game.get_player().get_position()
+        display = ViewportDisplay(game.get_entities(), game.get_dungeon_dimensions(),
+                                  Camera(20, 60))
+        expected = self.a2.Display(game.get_game_information(), game.get_dungeon_size())
+        self.assertEqual(display.render_game(player), expected.render_game(player))
+
+    def test_window(self):
+        """ test a window smaller than the map scrolls with the player across game2.txt """
+        from viewport import Camera, ViewportDisplay
+        game = self.a2.GameLogic('game2.txt')
+        camera = Camera(3, 4, 1)
+        for actions, expected in (('', '#   \n#O  \n#   '),
+                                  ('DDDDD', '# K#\n  O#\n   #'),
+                                  ('SSSS', '   #\n  O#\n####')):
+            for action in actions:
+                game.step(action)
+            display = ViewportDisplay(game.get_entities(), game.get_dungeon_dimensions(), camera)
+            self.assertEqual(display.render_game(game.get_player().get_position()), expected)
+
+
+    def test_curses_frame(self):
+        """ test CursesGameApp draws the window above a status bar sized to the screen """
+        from unittest import mock
+        import curses_app
+
+        class Screen:
+            def __init__(self):
+                self.lines = {}
+
+            def getmaxyx(self):
+                return 4, 5
+
+            def erase(self):
+                self.lines.clear()
+
+            def addnstr(self, row, col, text, n, *attributes):
+                self.lines[row] = text[:n]
+
+            def noutrefresh(self):
+                pass
+
+        app = curses_app.CursesGameApp('game2.txt')
+        app._screen = screen = Screen()
+        with mock.patch.object(curses_app.curses, 'doupdate'):
+            app.step('D')
+            app.draw()
+        self.assertEqual(screen.lines, {0: '#   #', 1: '# O  ', 2: '#    ', 3: 'Move'})
+        self.assertEqual(app._camera.get_size(), (3, 5))
+
+
+class TestLevelCache(TestFunctionality):
+    """ Test level_cache.py """
+
+    class Parsed:
+        """ a stand-in level whose size is its file's length """
+
+        def __init__(self, filename):
+            self.text = Path(filename).read_text()
+
+        def get_nbytes(self):
+            return len(self.text)
+
+    def test_hits_and_misses(self):
+        """ test repeated lookups of a file are hits that share one parsed level """
+        from level_cache import LevelCache
+        cache = LevelCache()
+        first = cache.get('game1.txt', self.Parsed)
+        self.assertIs(cache.get('game1.txt', self.Parsed), first)
+        self.assertIs(cache.get('./game1.txt', self.Parsed), first)
+        cache.get('game2.txt', self.Parsed)
+        stats = cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 2, 2))
+        self.assertEqual(stats['bytes'], first.get_nbytes() + len(Path('game2.txt').read_text()))
+        cache.clear()
+        cache.get('game1.txt', self.Parsed)
+        self.assertEqual(cache.get_stats()['misses'], 3)
+
+    def test_byte_budget(self):
+        """ test the least recently used levels are evicted once the byte budget is passed """
+        from level_cache import LevelCache
+        with tempfile.TemporaryDirectory() as directory:
+            names = []
+            for name in 'abc':
+                names.append(str(Path(directory, name)))
+                Path(names[-1]).write_text('#' * 10)
+            cache = LevelCache(max_bytes=20)
+            cache.get(names[0], self.Parsed)
+            cache.get(names[1], self.Parsed)
+            cache.get(names[0], self.Parsed)
+            cache.get(names[2], self.Parsed)
+            stats = cache.get_stats()
+            self.assertEqual((stats['entries'], stats['bytes'], stats['evictions']), (2, 20, 1))
+            cache.get(names[0], self.Parsed)
+            self.assertEqual(cache.get_stats()['hits'], 2)
+            cache.get(names[1], self.Parsed)
+            self.assertEqual(cache.get_stats()['misses'], 4)
+
+            oversized = LevelCache(max_bytes=5)
+            oversized.get(names[0], self.Parsed)
+            self.assertEqual(oversized.get_stats()['entries'], 1)
+
+    def test_invalidation(self):
+        """ test a file whose modification time or size changed replaces its stale entry """
+        import os
+        from level_cache import LevelCache
+        with tempfile.TemporaryDirectory() as directory:
+            name = str(Path(directory, 'level.txt'))
+            Path(name).write_text('#O#')
+            os.utime(name, ns=(10 ** 9, 10 ** 9))
+            cache = LevelCache()
+            first = cache.get(name, self.Parsed)
+
+            os.utime(name, ns=(2 * 10 ** 9, 2 * 10 ** 9))
+            second = cache.get(name, self.Parsed)
+            self.assertIsNot(second, first)
+            self.assertIs(cache.get(name, self.Parsed), second)
+
+            Path(name).write_text('#O #')
+            os.utime(name, ns=(2 * 10 ** 9, 2 * 10 ** 9))
+            third = cache.get(name, self.Parsed)
+            self.assertEqual(third.text, '#O #')
+            stats = cache.get_stats()
+            self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 3, 0))
+            self.assertEqual((stats['entries'], stats['bytes']), (1, 4))
+
+
 def main():
     test_cases = [
         TestDesign,
@@ -949,7 +1875,18 @@ def main():
         TestDoor,
         TestPlayer,
         TestGameLogic,
-        TestGameApp
+        TestGameApp,
+        TestTerminal,
+        TestLevelFormat,
+        TestGenerate,
+        TestSolver,
+        TestValidate,
+        TestSessionStore,
+        TestBatchReplay,
+        TestAsyncApp,
+        TestServer,
+        TestViewport,
+        TestLevelCache
     ]
 
     master = TestMaster(max_diff=None,
@@ -0,0 +1,212 @@
+"""Fast structural checks that reject levels which can never be won.
+
+Before spending solver time on a level, check_level makes sure it has one
+player, a key and a door, and that the key and a door lie in the player's
+connected region of non-wall tiles. Regions are labelled with a single
+flood fill over the packed grid, so the check is linear in the number of
+cells. The first failing condition is returned as a LevelProblem.
+
+Usage:
+    python validate.py levels/*.txt --workers 8
+"""
+
+import argparse
+import json
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from a2_support import *
+from distances import grid_offsets
+
+MISSING_PLAYER = "missing_player"
+MULTIPLE_PLAYERS = "multiple_players"
+MISSING_KEY = "missing_key"
+MISSING_DOOR = "missing_door"
+KEY_UNREACHABLE = "key_unreachable"
+DOOR_UNREACHABLE = "door_unreachable"
+
+
+class LevelProblem:
+    """The reason a level was rejected."""
+
+    __slots__ = ("_code", "_message", "_position")
+
+    def __init__(self, code, message, position=None):
+        """Construct a problem report.
+
+        Parameters:
+            code (str): One of the problem codes defined in this module.
+            message (str): A description of the problem.
+            position (tuple<int, int>): The cell the problem concerns, if any.
+        """
+        self._code = code
+        self._message = message
+        self._position = position
+
+    def get_code(self):
+        """Returns the problem code."""
+        return self._code
+
+    def get_message(self):
+        """Returns a description of the problem."""
+        return self._message
+
+    def get_position(self):
+        """Returns the cell the problem concerns, or None."""
+        return self._position
+
+    def to_dict(self):
+        """Returns the problem as a JSON-serialisable dictionary."""
+        position = None if self._position is None else list(self._position)
+        return {"code": self._code, "message": self._message,
+                "position": position}
+
+    def __str__(self):
+        """Returns the problem code and message."""
+        return f"{self._code}: {self._message}"
+
+    def __repr__(self):
+        """Same as str(self)."""
+        return self.__str__()
+
+
+def to_grid(dungeon):
+    """Returns a Grid for a dungeon given as a Grid or as load_game output.
+
+    Parameters:
+        dungeon (Grid | list<list<str>>): The dungeon layout. Short rows of
+            a list layout are padded with walls.
+    """
+    if isinstance(dungeon, Grid):
+        return dungeon
+    height = len(dungeon)
+    width = max((len(row) for row in dungeon), default=0)
+    cells = bytearray()
+    for row in dungeon:
+        cells += "".join(row).ljust(width, WALL).encode("latin-1")
+    return Grid(width, height, cells)
+
+
+def label_components(grid):
+    """Label the connected regions of non-wall cells of a grid.
+
+    Parameters:
+        grid (Grid): The dungeon layout.
+
+    Returns:
+        (array<int>): The region number of every cell, indexed by
+            row * width + col, starting at 1; walls are labelled 0.
+    """
+    width, height = grid.get_width(), grid.get_height()
+    cells = width * height
+    tiles = grid.to_bytes()
+    offsets = grid_offsets(width)
+    wall = ord(WALL)
+    labels = array("i", [0]) * cells
+    region = 0
+
+    index = 0
+    while index < cells:
+        if tiles[index] == wall or labels[index]:
+            index += 1
+            continue
+        region += 1
+        labels[index] = region
+        stack = [index]
+        while stack:
+            cell = stack.pop()
+            col = cell % width
+            for _, offset, drow, dcol in offsets:
+                target = cell + offset
+                if 0 <= target < cells and 0 <= col + dcol < width \
+                        and not labels[target] and tiles[target] != wall:
+                    labels[target] = region
+                    stack.append(target)
+        index += 1
+    return labels
+
+
+def check_level(dungeon):
+    """Check that a level could be won, ignoring its move budget.
+
+    Parameters:
+        dungeon (Grid | list<list<str>>): The dungeon layout, as returned by
+            load_grid or load_game.
+
+    Returns:
+        (LevelProblem): The first condition that fails, or None if the level
+            passes every check.
+    """
+    grid = to_grid(dungeon)
+    players = grid.find_all(PLAYER)
+    if not players:
+        return LevelProblem(MISSING_PLAYER, "the level has no player")
+    if len(players) > 1:
+        return LevelProblem(MULTIPLE_PLAYERS,
+                            f"the level has {len(players)} players",
+                            players[1])
+    keys = grid.find_all(KEY)
+    if not keys:
+        return LevelProblem(MISSING_KEY, "the level has no key")
+    doors = grid.find_all(DOOR)
+    if not doors:
+        return LevelProblem(MISSING_DOOR, "the level has no door")
+
+    labels = label_components(grid)
+    width = grid.get_width()
+    player = players[0]
+    region = labels[player[0] * width + player[1]]
+    if all(labels[row * width + col] != region for row, col in keys):
+        return LevelProblem(KEY_UNREACHABLE,
+                            "no key can be reached from the player",
+                            keys[0])
+    if all(labels[row * width + col] != region for row, col in doors):
+        return LevelProblem(DOOR_UNREACHABLE,
+                            "no door can be reached from the player",
+                            doors[0])
+    return None
+
+
+def check_file(filename):
+    """Check a level file.
+
+    Parameters:
+        filename (str): The level file.
+
+    Returns:
+        (tuple<str, LevelProblem>): The file name and its first problem, or
+            None if it passes.
+    """
+    return filename, check_level(load_grid(filename))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Reject level files that can never be won.")
+    parser.add_argument("levels", nargs="+", help="level files")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=32,
+                        help="files sent to a worker at a time")
+    parser.add_argument("--json", action="store_true",
+                        help="write one JSON object per level")
+    args = parser.parse_args()
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for filename, problem in executor.map(check_file, args.levels,
+                                              chunksize=args.chunksize):
+            failed += problem is not None
+            if args.json:
+                print(json.dumps({
+                    "level": filename,
+                    "problem": problem and problem.to_dict(),
+                }))
+            else:
+                print(f"{filename}: {problem if problem else 'ok'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Draw only a window of the dungeon around the player.
+
+Display prints every cell of the dungeon, which floods the terminal and
+costs time proportional to the map on large caves. ViewportDisplay prints
+only the cells inside a fixed-size window, looking each one up in the game
+information, so drawing costs the same however large the map is.
+
+The window is placed by a Camera. It starts centred on the player and
+then scrolls only when the player comes within a margin of its edge, so
+the view does not jump on every move. The window never extends past the
+map, and a map smaller than the window is shown whole, exactly as Display
+shows it.
+
+Usage:
+    python viewport.py cave.txt --rows 20 --cols 60 --margin 5
+"""
+
+import argparse
+
+from a2 import GameApp, GameLogic
+from a2_support import *
+
+DEFAULT_ROWS = 20
+DEFAULT_COLS = 60
+DEFAULT_MARGIN = 4
+
+
+def _scroll(origin, position, view, size, margin):
+    """Returns the new origin of a window along one axis.
+
+    Parameters:
+        origin (int): The current origin, or None to centre on position.
+        position (int): The player's coordinate.
+        view (int): The length of the window.
+        size (int): The length of the map.
+        margin (int): How close the player may come to the window's edge.
+    """
+    if view >= size:
+        return 0
+    if origin is None:
+        origin = position - view // 2
+    else:
+        margin = min(margin, (view - 1) // 2)
+        if position < origin + margin:
+            origin = position - margin
+        elif position > origin + view - 1 - margin:
+            origin = position - (view - 1 - margin)
+    return max(0, min(origin, size - view))
+
+
+class Camera:
+    """The window of the dungeon that is drawn."""
+
+    __slots__ = ("_rows", "_cols", "_margin", "_top", "_left")
+
+    def __init__(self, rows=DEFAULT_ROWS, cols=DEFAULT_COLS,
+                 margin=DEFAULT_MARGIN):
+        """Construct a camera that has not been placed yet.
+
+        Parameters:
+            rows (int): The height of the window.
+            cols (int): The width of the window.
+            margin (int): How close the player may come to an edge of the
+                window before it scrolls.
+        """
+        self._rows = rows
+        self._cols = cols
+        self._margin = margin
+        self._top = None
+        self._left = None
+
+    def get_size(self):
+        """Returns the (rows, cols) of the window."""
+        return self._rows, self._cols
+
+    def follow(self, position, dungeon_size):
+        """Scroll the window to keep a position inside its margins.
+
+        Parameters:
+            position (tuple<int, int>): The player's position.
+            dungeon_size (tuple<int, int>): The (height, width) of the map.
+
+        Returns:
+            (tuple<int, int, int, int>): The top, left, height and width of
+                the visible part of the map.
+        """
+        height, width = dungeon_size
+        row, col = position
+        self._top = _scroll(self._top, row, self._rows, height, self._margin)
+        self._left = _scroll(self._left, col, self._cols, width, self._margin)
+        return (self._top, self._left,
+                min(self._rows, height), min(self._cols, width))
+
+    def recentre(self):
+        """Makes the next follow centre the window on the player again."""
+        self._top = self._left = None
+
+
+class ViewportDisplay(Display):
+    """A Display that shows only the camera's window of the dungeon."""
+
+    def __init__(self, game_information, dungeon_size, camera):
+        """Construct a view of part of the dungeon.
+
+        Parameters:
+            game_information (dict<tuple<int, int>: Entity>): Dictionary
+                containing the position and the corresponding Entity.
+            dungeon_size (int | tuple<int, int>): The width of a square
+                dungeon, or the (height, width) of a rectangular one.
+            camera (Camera): Chooses the window to show. It is scrolled to
+                follow the player.
+        """
+        super().__init__(game_information, dungeon_size)
+        self._camera = camera
+
+    def render_game(self, player_pos):
+        """Returns the visible rows of the dungeon as one string.
+
+        Parameters:
+            player_pos (tuple<int, int>): The position of the Player.
+        """
+        top, left, rows, cols = self._camera.follow(
+            player_pos, (self._height, self._width))
+        get = self._game_information.get
+        lines = []
+        for row in range(top, top + rows):
+            glyphs = []
+            for col in range(left, left + cols):
+                entity = get((row, col))
+                if entity is not None:
+                    glyphs.append(entity.get_id())
+                elif (row, col) == player_pos:
+                    glyphs.append(PLAYER)
+                else:
+                    glyphs.append(SPACE)
+            lines.append("".join(glyphs))
+        return "\n".join(lines)
+
+
+class ViewportGameApp(GameApp):
+    """A GameApp that draws through a ViewportDisplay."""
+
+    def __init__(self, dungeon_name="game1.txt", camera=None):
+        """Construct the app.
+
+        Parameters:
+            dungeon_name (str): The level to play.
+            camera (Camera): The window to draw (default: Camera()).
+        """
+        self._game = GameLogic(dungeon_name)
+        self._writer = FrameWriter()
+        self._camera = camera or Camera()
+
+    def draw(self):
+        """Displays the window around the player and the moves left."""
+        display = ViewportDisplay(self._game.get_entities(),
+                                  self._game.get_dungeon_dimensions(),
+                                  self._camera)
+        player = self._game.get_player()
+        self._writer.write(display.render_game(player.get_position()) + "\n"
+                           + display.render_moves(player.moves_remaining())
+                           + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play a level showing only a window around the player.")
+    parser.add_argument("level", nargs="?", default="game1.txt",
+                        help="level file")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS,
+                        help="height of the window")
+    parser.add_argument("--cols", type=int, default=DEFAULT_COLS,
+                        help="width of the window")
+    parser.add_argument("--margin", type=int, default=DEFAULT_MARGIN,
+                        help="distance from the window's edge at which it "
+                             "scrolls")
+    args = parser.parse_args()
+    camera = Camera(args.rows, args.cols, args.margin)
+    ViewportGameApp(args.level, camera).play()
+
+
+if __name__ == "__main__":
+    main()